@@ -1,12 +1,99 @@
-from fastapi import Depends
-from infrastructure.db.database import get_db
-from application.services import ProductService, PropertyService
-from infrastructure.db.repositories import SQLProductRepository, SQLPropertyRepository
+import hashlib
+import time
+from contextlib import asynccontextmanager
 
+from fastapi import Depends, HTTPException, Request, Response
+from infrastructure.db.database import get_db, AsyncSessionLocal, replica_router
+from application.services import ProductService, PropertyService, JobService
+from infrastructure.db.repositories import SQLProductRepository, SQLPropertyRepository, SnapshotProductRepository
+from infrastructure.db.snapshot import catalog_snapshot
+from infrastructure.cache import response_cache
+from infrastructure.events import event_broker
+from infrastructure.jobs import job_queue
+from config import settings
 
-async def get_product_service(db=Depends(get_db)):
-    return ProductService(SQLProductRepository(db))
+PRIMARY_UNTIL_COOKIE = "catalog_primary_until"
 
 
-async def get_property_service(db=Depends(get_db)):
-    return PropertyService(SQLPropertyRepository(db))
+def mark_wrote(response: Response):
+    # Клиент, только что писавший, ещё DB_READ_YOUR_WRITES_SECONDS читает с primary и не видит отставания реплик
+    window = settings.DB_READ_YOUR_WRITES_SECONDS
+    if window > 0:
+        response.set_cookie(PRIMARY_UNTIL_COOKIE, f"{time.time() + window:.3f}", max_age=int(window) + 1, httponly=True)
+
+
+def reads_from_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_db(request: Request):
+    session_maker = AsyncSessionLocal if reads_from_primary(request) else replica_router.choose()
+    async with session_maker() as session:
+        yield session
+
+
+async def get_product_service(response: Response, db=Depends(get_db)):
+    mark_wrote(response)
+    return ProductService(SQLProductRepository(db), response_cache, event_broker)
+
+
+def read_repository(session, primary: bool):
+    # Клиент в окне read-your-writes читает из БД: снимок догоняет запись асинхронно, по уведомлению
+    repository = SQLProductRepository(session)
+    if settings.CATALOG_ENGINE == "snapshot" and not primary:
+        return SnapshotProductRepository(repository, catalog_snapshot)
+    return repository
+
+
+async def get_product_read_service(request: Request, db=Depends(get_read_db)):
+    primary = reads_from_primary(request)
+    # Писавший клиент читает мимо кэша: там мог лежать ответ отстающей реплики или снимка
+    return ProductService(read_repository(db, primary), None if primary else response_cache)
+
+
+async def get_property_service(response: Response, db=Depends(get_db)):
+    mark_wrote(response)
+    return PropertyService(SQLPropertyRepository(db), response_cache, event_broker)
+
+
+async def get_property_read_service(db=Depends(get_read_db)):
+    return PropertyService(SQLPropertyRepository(db), response_cache)
+
+
+@asynccontextmanager
+async def product_service_scope(primary: bool = False):
+    # Для потоковых ответов и фоновых задач: сессия живёт столько, сколько нужна вызывающему, а не запрос
+    session_maker = AsyncSessionLocal if primary else replica_router.choose()
+    async with session_maker() as session:
+        yield ProductService(read_repository(session, primary), response_cache, event_broker)
+
+
+async def get_job_service():
+    return JobService(job_queue)
+
+
+def make_etag(revision: int, request: Request) -> str:
+    # Тело ответа определяется ревизией каталога и URL запроса
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.sha1(f"{request.url.path}?{query}".encode()).hexdigest()[:16]
+    return f'"{revision}-{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+async def conditional_get(request: Request,
+                          response: Response,
+                          service: ProductService = Depends(get_product_read_service)):
+    etag = make_etag(await service.catalog_revision(), request)
+    if etag_matches(etag, request.headers.get("if-none-match")):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
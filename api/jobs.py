@@ -0,0 +1,63 @@
+from api.dependencies import product_service_scope
+from api.schemas import ProductSchema
+from application.dto import BulkProductResultDTO
+from config import settings
+from infrastructure.jobs import JobQueue, Progress
+
+
+async def bulk_import(payload: dict, progress: Progress) -> dict:
+    # Пачки коммитятся по отдельности: прогресс виден сразу, а упавшая пачка не откатывает остальные
+    products = [ProductSchema.model_validate(product) for product in payload.get("products", [])]
+    indexes = payload.get("indexes") or list(range(len(products)))
+    failed = [BulkProductResultDTO.model_validate(item) for item in payload.get("invalid", [])]
+    created = updated = 0
+    batch_size = settings.BULK_IMPORT_BATCH_SIZE
+
+    await progress(0, len(products))
+    for start in range(0, len(products), batch_size):
+        async with product_service_scope(primary=True) as service:
+            result = await service.bulk_add_products(products[start:start + batch_size])
+        created += result.created
+        updated += result.updated
+        for item in result.items:
+            if item.status == "failed":
+                item.index = indexes[start + item.index]
+                failed.append(item)
+        await progress(min(start + batch_size, len(products)), len(products))
+
+    return {
+        "created": created,
+        "updated": updated,
+        "failed": len(failed),
+        "items": [item.model_dump() for item in sorted(failed, key=lambda item: item.index)],
+    }
+
+
+async def facet_rebuild(payload: dict, progress: Progress) -> dict:
+    # Индекс фасетов свой у каждого процесса — перестраивается тот, что у воркера, взявшего задачу
+    async with product_service_scope() as service:
+        return {"loaded": await service.rebuild_facet_index()}
+
+
+async def cache_warmup(payload: dict, progress: Progress) -> dict:
+    # Прогреваем первые страницы каталога и статистику фильтров теми же параметрами, что шлёт клиент по умолчанию
+    pages = int(payload.get("pages", 5))
+    page_size = int(payload.get("page_size", 10))
+    sort = payload.get("sort", "uid")
+
+    await progress(0, pages + 1)
+    async with product_service_scope() as service:
+        await service.get_filter_statistics()
+        await progress(1, pages + 1)
+        for page in range(1, pages + 1):
+            result = await service.catalog_list_products(page, page_size, None, None, sort, None, True, "contains")
+            await progress(page + 1, pages + 1)
+            if len(result["products"]) < page_size:
+                break
+    return {"pages": page if pages else 0}
+
+
+def register_job_handlers(queue: JobQueue) -> None:
+    queue.register("bulk_import", bulk_import)
+    queue.register("facet_rebuild", facet_rebuild)
+    queue.register("cache_warmup", cache_warmup)
@@ -0,0 +1,45 @@
+import json
+import time
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from infrastructure.metrics import observe_serialization
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость: pip install ".[fast]"
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MeasuredJSONResponse(JSONResponse):
+    # Время кодирования тела попадает в метрики запроса; jsonable_encoder FastAPI сюда не входит
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        try:
+            return self.encode(content)
+        finally:
+            observe_serialization(time.perf_counter() - started)
+
+    def encode(self, content: Any) -> bytes:
+        return super().render(content)
+
+
+class DocumentResponse(MeasuredJSONResponse):
+    def encode(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def document_response(content: Any, response: Response, status_code: int = 200) -> DocumentResponse:
+    # Готовый документ из dict/list отдаётся мимо response_model: FastAPI не валидирует его повторно
+    # и не обходит jsonable_encoder-ом. Заголовки, выставленные зависимостями (ETag, cookie), переносим сами
+    document = DocumentResponse(content, status_code=status_code)
+    document.raw_headers.extend(response.raw_headers)
+    return document
@@ -20,6 +20,10 @@ class ProductSchema(BaseModel):
     properties: Optional[List[PropertySchema]] = None
 
 
+class ProductBatchSchema(BaseModel):
+    uids: List[str] = Field(min_length=1)
+
+
 class ProductResponseSchema(BaseModel):
     uid: str
     name: str
@@ -2,6 +2,8 @@ from fastapi import APIRouter
 from .endpoints.catalog import router as catalog_router
 from .endpoints.products import router as products_router
 from .endpoints.properties import router as properties_router
+from .endpoints.diagnostics import router as diagnostics_router
+from .endpoints.jobs import router as jobs_router
 
 
 def create_v1_router():
@@ -9,4 +11,6 @@ def create_v1_router():
     router.include_router(catalog_router)
     router.include_router(products_router)
     router.include_router(properties_router)
+    router.include_router(diagnostics_router)
+    router.include_router(jobs_router)
     return router
@@ -1,32 +1,87 @@
+import asyncio
+import json
 from typing import List, Dict, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
-from api.dependencies import get_product_service
+from api.dependencies import get_product_read_service, conditional_get
+from api.responses import document_response
 from api.schemas import ProductSchema
 from application.dto import CatalogResponse
 from application.services import ProductService
+from config import settings
+from infrastructure.events import Subscription, event_broker
 
 router = APIRouter(prefix="/catalog", tags=["Catalog"])
 
+MATCH_PATTERN = "^(prefix|contains|fulltext)$"
+FILTERS_DESCRIPTION = "`<property_uid>:<value>` or a numeric range `<property_uid>:gt|gte|lt|lte:<number>`"
 
-@router.get("/", response_model=CatalogResponse)
+
+@router.get("/", response_model=CatalogResponse, dependencies=[Depends(conditional_get)])
 async def list_catalog(
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    filters: list[str] | None = Query(None),
+    filters: list[str] | None = Query(None, description=FILTERS_DESCRIPTION),
     name: str | None = Query(None),
     sort: str = Query("uid", regex="^(name|uid)$"),
-    service: ProductService = Depends(get_product_service),
+    cursor: str | None = Query(None, description="Opaque next_cursor from the previous page"),
+    with_count: bool = Query(True),
+    match: str = Query("contains", regex=MATCH_PATTERN),
+    service: ProductService = Depends(get_product_read_service),
 ):
-    return await service.catalog_list_products(page, page_size, filters, name, sort)
+    return document_response(
+        await service.catalog_list_products(page, page_size, filters, name, sort, cursor, with_count, match),
+        response,
+    )
 
 
-@router.get("/filter/", response_model=dict)
+@router.get("/filter/", response_model=dict, dependencies=[Depends(conditional_get)])
 async def filter_catalog(
-    filters: list[str] | None = Query(None),
+    response: Response,
+    filters: list[str] | None = Query(None, description=FILTERS_DESCRIPTION),
     name: str | None = Query(None),
-    service: ProductService = Depends(get_product_service),
+    match: str = Query("contains", regex=MATCH_PATTERN),
+    service: ProductService = Depends(get_product_read_service),
 ):
-    return await service.get_filter_statistics(filters, name)
+    return document_response(await service.get_filter_statistics(filters, name, match), response)
+
+
+STREAM_RETRY_MS = 3000
+
+
+def sse_message(event: str, data: dict, id: Optional[str] = None) -> str:
+    head = f"id: {id}\n" if id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream_body(subscription: Subscription):
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                # Клиент отстал: дальше он сам дочитывает /v1/products/changes?since= и переподключается
+                yield sse_message("resync", {"since": subscription.since})
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENT_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Комментарий не даёт прокси закрыть простаивающее соединение
+                yield ": heartbeat\n\n"
+                continue
+            subscription.since = event["revision"] - 1
+            yield sse_message(event["type"], {"revision": event["revision"], "uids": event["uids"]}, event["id"])
+    finally:
+        event_broker.unsubscribe(subscription)
+
 
+@router.get("/stream")
+async def stream_catalog(last_event_id: str | None = Header(None)):
+    subscription = event_broker.subscribe(last_event_id)
+    return StreamingResponse(
+        stream_body(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
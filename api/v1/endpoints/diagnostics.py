@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from infrastructure.cache import response_cache
+from infrastructure.db.engine import pool_statistics
+
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+
+@router.get("/cache", response_model=dict)
+async def cache_stats():
+    if response_cache is None:
+        return {"backend": None}
+    return response_cache.stats()
+
+
+@router.get("/pool", response_model=dict)
+async def pool_stats():
+    return pool_statistics()
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+
+from api.dependencies import get_job_service
+from api.v1.endpoints.products import submit_bulk_import, validate_products
+from application.dto import JobDTO
+from application.services import JobService
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/", response_model=list[JobDTO])
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=1000),
+    service: JobService = Depends(get_job_service),
+):
+    return await service.list_jobs(limit)
+
+
+@router.get("/{job_id}", response_model=JobDTO)
+async def get_job(job_id: str, service: JobService = Depends(get_job_service)):
+    return await service.get_job(job_id)
+
+
+@router.post("/{kind}", response_model=JobDTO, status_code=202)
+async def submit_job(
+    kind: str,
+    response: Response,
+    payload: dict | None = Body(None, description="bulk_import: {products}, cache_warmup: {pages, page_size, sort}"),
+    service: JobService = Depends(get_job_service),
+):
+    if kind == "bulk_import":
+        # Тот же путь, что у /products/bulk?background=true: проверка схемы и uid-ы, зафиксированные в payload,
+        # иначе повтор отпущенной или просроченной задачи создал бы товары заново
+        products = (payload or {}).get("products")
+        if not isinstance(products, list):
+            raise HTTPException(status_code=422, detail="bulk_import expects {\"products\": [...]}")
+        valid, invalid = validate_products(products)
+        return await submit_bulk_import(service, response, valid, invalid)
+    return await service.submit(kind, payload)
@@ -1,33 +1,205 @@
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+from uuid import uuid4
 
-from api.dependencies import get_product_service
-from api.schemas import ProductSchema, ProductResponseSchema
-from application.services import ProductService
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from api.dependencies import get_product_service, get_product_read_service, product_service_scope, conditional_get, \
+    get_job_service
+from api.responses import document_response
+from api.schemas import ProductSchema, ProductResponseSchema, ProductBatchSchema
+from application.dto import BulkImportResponse, BulkProductResultDTO, JobDTO, ProductBatchResponse, \
+    ProductChangesResponse
+from application.services import ProductService, JobService
+from config import settings
 
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+EXPORT_CSV_COLUMNS = (
+    "product_uid", "product_name", "property_uid", "property_name", "property_type", "value_uid", "value",
+)
+EXPORT_CHUNK_SIZE = 64 * 1024
+BACKGROUND_DESCRIPTION = "Run as a background job: responds 202 with the job, poll /v1/jobs/{id} for the result"
+
+
+def parse_bulk_body(body: bytes, ndjson: bool) -> tuple[list[tuple[int, ProductSchema]], list[BulkProductResultDTO]]:
+    if ndjson:
+        raw_items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw_items.append(json.loads(line))
+            except ValueError as e:
+                raw_items.append(e)
+    else:
+        try:
+            raw_items = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        if not isinstance(raw_items, list):
+            raise HTTPException(status_code=422, detail="Expected a JSON array of products")
+    return validate_products(raw_items)
+
+
+def validate_products(raw_items: list) -> tuple[list[tuple[int, ProductSchema]], list[BulkProductResultDTO]]:
+    if len(raw_items) > settings.BULK_IMPORT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many products in one request, max {settings.BULK_IMPORT_MAX_ITEMS}",
+        )
+
+    valid, invalid = [], []
+    for index, raw_item in enumerate(raw_items):
+        if isinstance(raw_item, ValueError):
+            invalid.append(BulkProductResultDTO(index=index, status="invalid", detail=f"Invalid JSON: {raw_item}"))
+            continue
+        try:
+            valid.append((index, ProductSchema.model_validate(raw_item)))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            invalid.append(BulkProductResultDTO(index=index, status="invalid", detail=detail))
+    return valid, invalid
+
 
 @router.get("/", response_model=list[ProductSchema])
-async def list_products(service: ProductService = Depends(get_product_service)):
+async def list_products(service: ProductService = Depends(get_product_read_service)):
     return await service.list_products()
 
 
-@router.post("/", response_model=ProductSchema)
+def ndjson_lines(product: dict):
+    yield json.dumps(product, ensure_ascii=False) + "\n"
+
+
+def csv_lines(product: dict):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = [
+        (product["uid"], product["name"], prop["uid"], prop["name"], prop["type"], v["value_uid"], v["value"])
+        for prop in product["properties"]
+        for v in prop["values"] or [{"value_uid": None, "value": None}]
+    ]
+    writer.writerows(rows or [(product["uid"], product["name"], None, None, None, None, None)])
+    yield buffer.getvalue()
+
+
+async def export_body(format: str):
+    encode = csv_lines if format == "csv" else ndjson_lines
+    chunk = ",".join(EXPORT_CSV_COLUMNS) + "\r\n" if format == "csv" else ""
+    async with product_service_scope() as service:
+        async for product in service.export_products(settings.EXPORT_BATCH_SIZE):
+            chunk += "".join(encode(product))
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                yield chunk
+                chunk = ""
+    if chunk:
+        yield chunk
+
+
+@router.get("/export")
+async def export_products(format: str = Query("ndjson", regex="^(ndjson|csv)$")):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_body(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+def with_stable_uids(product: ProductSchema) -> dict:
+    # uid-ы, которые иначе сгенерировал бы bulk_create, фиксируются в payload до запуска задачи:
+    # перезапущенная задача обновит уже записанные товары и свойства, а не создаст их копии
+    document = product.model_dump()
+    document["uid"] = document["uid"] or str(uuid4())
+    for property in document["properties"] or ():
+        property["uid"] = property["uid"] or str(uuid4())
+    return document
+
+
+async def submit_bulk_import(jobs: JobService, response: Response,
+                             valid: list[tuple[int, ProductSchema]], invalid: list[BulkProductResultDTO]):
+    job = await jobs.submit("bulk_import", {
+        "products": [with_stable_uids(product) for _, product in valid],
+        "indexes": [index for index, _ in valid],
+        "invalid": [item.model_dump() for item in invalid],
+    })
+    return document_response(jsonable_encoder(job), response, status_code=202)
+
+
+@router.post("/", response_model=ProductSchema, responses={202: {"model": JobDTO}})
 async def create_product(product: ProductSchema,
-                         service: ProductService = Depends(get_product_service)):
+                         response: Response,
+                         background: bool = Query(False, description=BACKGROUND_DESCRIPTION),
+                         service: ProductService = Depends(get_product_service),
+                         jobs: JobService = Depends(get_job_service)):
+    if background:
+        return await submit_bulk_import(jobs, response, [(0, product)], [])
     return await service.add_product(product)
 
 
-@router.get("/product/{uid}", response_model=ProductResponseSchema)
+@router.post("/bulk", response_model=BulkImportResponse, responses={202: {"model": JobDTO}})
+async def bulk_create_products(request: Request,
+                               response: Response,
+                               background: bool = Query(False, description=BACKGROUND_DESCRIPTION),
+                               service: ProductService = Depends(get_product_service),
+                               jobs: JobService = Depends(get_job_service)):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    valid, invalid = parse_bulk_body(await request.body(), content_type in NDJSON_MEDIA_TYPES)
+    if background:
+        return await submit_bulk_import(jobs, response, valid, invalid)
+
+    result = await service.bulk_add_products([product for _, product in valid])
+    for item, (index, _) in zip(result.items, valid):
+        item.index = index
+    result.items = sorted(result.items + invalid, key=lambda item: item.index)
+    result.failed += len(invalid)
+    return result
+
+
+@router.post("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    batch: ProductBatchSchema,
+    response: Response,
+    service: ProductService = Depends(get_product_read_service),
+):
+    # Одна сессия и один набор IN-запросов вместо отдельного GET /product/{uid} на каждый товар
+    if len(batch.uids) > settings.PRODUCT_BATCH_MAX_UIDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many uids in one request, max {settings.PRODUCT_BATCH_MAX_UIDS}",
+        )
+    return document_response(await service.get_products(batch.uids), response)
+
+
+@router.get("/changes", response_model=ProductChangesResponse)
+async def get_product_changes(
+    response: Response,
+    since: int | None = Query(None, ge=0, description="revision from the previous response; omit for a full sync"),
+    cursor: str | None = Query(None, description="Opaque next_cursor from the previous page"),
+    limit: int = Query(500, ge=1, le=5000),
+    service: ProductService = Depends(get_product_read_service),
+):
+    # Товары, изменённые или удалённые после ревизии since. Пока есть next_cursor — дочитываем страницы,
+    # затем сохраняем revision и передаём его как since при следующей синхронизации
+    return document_response(await service.get_changes(since, cursor, limit), response)
+
+
+@router.get("/product/{uid}", response_model=ProductResponseSchema, dependencies=[Depends(conditional_get)])
 async def get_product(
     uid: str,
-    service: ProductService = Depends(get_product_service),
+    response: Response,
+    service: ProductService = Depends(get_product_read_service),
 ):
     product = await service.get_product(uid)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return document_response(product, response)
 
 
 @router.delete("/product/{uid}", status_code=204)
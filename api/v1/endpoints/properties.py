@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 
-from api.dependencies import get_property_service
+from api.dependencies import get_property_service, get_property_read_service
 from api.schemas import PropertySchema
 from application.services import PropertyService
 
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/properties", tags=["Properties"])
 
 
 @router.get("/", response_model=list[PropertySchema])
-async def list_products(service: PropertyService = Depends(get_property_service)):
+async def list_products(service: PropertyService = Depends(get_property_read_service)):
     return await service.list_properties()
 
 
@@ -1,12 +1,72 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from api.v1 import create_v1_router
+from api.jobs import register_job_handlers
+from api.responses import MeasuredJSONResponse
+from config import settings
+from infrastructure.cache import response_cache
+from infrastructure.db.engine import pool_statistics
+from infrastructure.db.facet_index import facet_index
+from infrastructure.db.snapshot import catalog_snapshot
+from infrastructure.events import event_broker
+from infrastructure.jobs import job_queue
+from infrastructure.metrics import CONTENT_TYPE, MetricsMiddleware, cache_collector, events_collector, \
+    pool_collector, registry
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up() -> None:
+    if settings.CATALOG_ENGINE == "snapshot":
+        while not catalog_snapshot.ready:
+            await asyncio.sleep(0.1)
+    elif settings.FACET_INDEX_ENABLED:
+        await facet_index.rebuild()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    event_broker.start()
+    if settings.CATALOG_ENGINE == "snapshot":
+        catalog_snapshot.start()
+    if settings.WARM_ON_STARTUP:
+        try:
+            await asyncio.wait_for(warm_up(), settings.WARM_TIMEOUT)
+        except Exception:
+            # Не прогрелись — воркер всё равно принимает запросы, чтения идут из SQL, пока кэш не догрузится
+            logger.exception("Warm-up did not finish, serving without warm caches")
+    yield
+    await catalog_snapshot.stop()
+    await facet_index.stop()
+    await event_broker.stop()
+    await job_queue.stop()
 
 
 def create_app() -> FastAPI:
-    app: FastAPI = FastAPI(title="Catalog API", version="1.0.0")
+    register_job_handlers(job_queue)
+    app: FastAPI = FastAPI(
+        title="Catalog API", version="1.0.0", lifespan=lifespan, default_response_class=MeasuredJSONResponse,
+    )
 
     app.include_router(create_v1_router())
 
+    if settings.METRICS_ENABLED or settings.QUERY_DEBUG:
+        app.add_middleware(MetricsMiddleware)
+
+    if settings.METRICS_ENABLED:
+        registry.collectors = [pool_collector(pool_statistics), events_collector(event_broker)]
+        if response_cache is not None:
+            registry.collectors.append(cache_collector(response_cache))
+
+        # Метрики у каждого процесса свои: при нескольких воркерах Prometheus должен опрашивать каждый
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            return Response(registry.render(), media_type=CONTENT_TYPE)
+
     @app.get("/")
     async def index():
         return {"message": "Catalog API is start!"}
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
@@ -26,6 +28,48 @@ class ProductResponseDTO(BaseModel):
     properties: List[PropertyDTO]
 
 
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponseDTO]
+    missing: List[str]
+
+
+class ProductChangesResponse(BaseModel):
+    products: List[ProductResponseDTO]
+    deleted: List[str]
+    properties: List[PropertyDTO]
+    deleted_properties: List[str]
+    revision: int
+    next_cursor: Optional[str] = None
+
+
 class CatalogResponse(BaseModel):
     products: List[ProductDTO]
-    count: int
+    count: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class BulkProductResultDTO(BaseModel):
+    index: int
+    uid: Optional[str] = None
+    status: str
+    detail: Optional[str] = None
+
+
+class BulkImportResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    items: List[BulkProductResultDTO]
+
+
+class JobDTO(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: int = 0
+    total: Optional[int] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
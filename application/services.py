@@ -1,14 +1,89 @@
-from typing import Dict, Optional
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
 
 from fastapi import HTTPException
 from domain.repositories import ProductRepository, PropertyRepository
 from domain.entities import Product, Property, PropertyValue
-from application.dto import ProductDTO, PropertyDTO, PropertyValueDTO, ProductResponseDTO
+from infrastructure.cache import ResponseCache
+from infrastructure.events import EventBroker
+from infrastructure.jobs import JobQueue
+from application.dto import ProductDTO, PropertyDTO, PropertyValueDTO, BulkProductResultDTO, BulkImportResponse, \
+    JobDTO
+
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+
+def parse_filters(filters: list[str] | None) -> tuple[dict[str, list[str]], dict[str, dict[str, Decimal]]]:
+    parsed_filters = {}
+    parsed_ranges = {}
+    if filters:
+        for filter_str in filters:
+            if ":" not in filter_str:
+                raise HTTPException(status_code=400, detail=f"Invalid filter {filter_str!r}, expected uid:value")
+            key, value = filter_str.split(":", 1)
+            operator, _, bound = value.partition(":")
+            if operator in RANGE_OPERATORS and bound:
+                try:
+                    number = Decimal(bound)
+                except InvalidOperation:
+                    number = None
+                # Decimal принимает NaN и Infinity: с ними сравнение в БД и в снимке ведёт себя по-разному
+                if number is None or not number.is_finite():
+                    raise HTTPException(status_code=400, detail=f"Invalid numeric bound in filter {filter_str!r}")
+                parsed_ranges.setdefault(key, {})[operator] = number
+                continue
+            if key not in parsed_filters:
+                parsed_filters[key] = []
+            parsed_filters[key].append(value)
+    return parsed_filters, parsed_ranges
+
+
+def encode_cursor(sort: str, key: tuple) -> str:
+    payload = json.dumps({"sort": sort, "key": list(key)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key = tuple(payload["key"])
+        cursor_sort = payload["sort"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or len(key) != (2 if sort in ("name", "changes") else 1):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    # Ключ уходит в сравнение в запросе: у "changes" первый элемент — change_seq, остальные — строки
+    types = (int, str) if sort == "changes" else (str,) * len(key)
+    if not all(isinstance(part, kind) and not isinstance(part, bool) for part, kind in zip(key, types)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
 
 
 class ProductService:
-    def __init__(self, repository: ProductRepository):
+    def __init__(self, repository: ProductRepository, cache: Optional[ResponseCache] = None,
+                 events: Optional[EventBroker] = None):
         self.repository = repository
+        self.cache = cache
+        self.events = events
+        self._revision: Optional[int] = None
+
+    async def _cached(self, namespace: str, params: dict, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if self.cache is None:
+            return await loader()
+        return await self.cache.get_or_set(namespace, await self.catalog_revision(), params, loader)
+
+    async def _invalidate_cache(self) -> None:
+        self._revision = None
+        if self.cache is not None:
+            await self.cache.invalidate()
+
+    async def _publish(self, *changes: tuple) -> None:
+        if self.events is not None:
+            await self.events.publish(self.repository.last_revision, changes)
 
     async def list_products(self) -> list[ProductDTO]:
         products = await self.repository.get_all()
@@ -23,18 +98,33 @@ class ProductService:
             ) for prop in p.properties]
         ) for p in products]
 
+    async def export_products(self, batch_size: int = 1000) -> AsyncIterator[dict]:
+        async for p in self.repository.stream_all(batch_size):
+            yield {
+                "uid": p.uid,
+                "name": p.name,
+                "properties": [{
+                    "uid": prop.uid,
+                    "name": prop.name,
+                    "type": prop.type,
+                    "values": [{"value_uid": v.value_uid, "value": v.value} for v in prop.values],
+                } for prop in p.properties],
+            }
+
     async def add_product(self, product_dto: ProductDTO) -> ProductDTO:
         domain_product = Product(
             uid=None,
             name=product_dto.name,
-            properties=[Property(
+            properties=tuple(Property(
                 uid=None,
                 name=p.name,
                 type=p.type,
-                values=[PropertyValue(value_uid=None, value=v.value) for v in p.values]
-            ) for p in product_dto.properties]
+                values=tuple(PropertyValue(value_uid=None, value=v.value) for v in p.values)
+            ) for p in product_dto.properties)
         )
         created_product = await self.repository.create(domain_product)
+        await self._invalidate_cache()
+        await self._publish(("product.created", [created_product.uid]))
         return ProductDTO(
             uid=created_product.uid,
             name=created_product.name,
@@ -46,32 +136,62 @@ class ProductService:
             ) for prop in created_product.properties]
         )
 
-    async def get_product(self, uid: str) -> ProductResponseDTO:
-        # Получаем товар из репозитория с загрузкой связанных данных
-        db_product = await self.repository.get_by_uid(uid)
-        if not db_product:
+    async def bulk_add_products(self, product_dtos: list[ProductDTO]) -> BulkImportResponse:
+        domain_products = [Product(
+            uid=product_dto.uid,
+            name=product_dto.name,
+            properties=tuple(Property(
+                uid=p.uid,
+                name=p.name,
+                type=p.type,
+                values=tuple(PropertyValue(value_uid=v.value_uid, value=v.value) for v in p.values or ())
+            ) for p in product_dto.properties or ())
+        ) for product_dto in product_dtos]
+        results = await self.repository.bulk_create(domain_products)
+        await self._invalidate_cache()
+        await self._publish(
+            ("product.created", [r["uid"] for r in results if r["status"] == "created"]),
+            ("product.updated", [r["uid"] for r in results if r["status"] == "updated"]),
+        )
+        items = [BulkProductResultDTO(index=index, **result) for index, result in enumerate(results)]
+        return BulkImportResponse(
+            created=sum(1 for item in items if item.status == "created"),
+            updated=sum(1 for item in items if item.status == "updated"),
+            failed=sum(1 for item in items if item.status == "failed"),
+            items=items,
+        )
+
+    async def catalog_revision(self) -> int:
+        # Одна ревизия на запрос: по ней строятся и ETag, и ключ кэша
+        if self._revision is None:
+            self._revision = await self.repository.get_revision()
+        return self._revision
+
+    async def get_product(self, uid: str) -> dict:
+        return await self._cached("product", {"uid": uid}, lambda: self._get_product(uid))
+
+    async def _get_product(self, uid: str) -> dict:
+        # Репозиторий отдаёт товар уже в форме ProductResponseDTO — промежуточные объекты не строим
+        document = await self.repository.get_document_by_uid(uid)
+        if not document:
             raise HTTPException(status_code=404, detail="Product not found")
+        return document
 
-        # Преобразуем ORM-модель в DTO
-        return ProductResponseDTO(
-            uid=db_product.uid,
-            name=db_product.name,
-            properties=[
-                {
-                    "uid": p.uid,
-                    "name": p.name,
-                    "type": p.type,
-                    "values": [
-                        {"value_uid": v.value_uid, "value": v.value}
-                        for v in p.values
-                    ]
-                }
-                for p in db_product.properties
-            ]
-        )
+    async def get_products(self, uids: list[str]) -> dict:
+        # Повторы схлопываем, порядок ответа — порядок первого упоминания uid в запросе
+        uids = list(dict.fromkeys(uids))
+        documents = await self._cached("products", {"uids": uids}, lambda: self.repository.get_many_documents(uids))
+        by_uid = {document["uid"]: document for document in documents}
+        return {
+            "products": [by_uid[uid] for uid in uids if uid in by_uid],
+            "missing": [uid for uid in uids if uid not in by_uid],
+        }
 
     async def delete_product(self, uid: str) -> bool:
-        await self.repository.delete(uid)
+        deleted = await self.repository.delete(uid)
+        await self._invalidate_cache()
+        if deleted:
+            await self._publish(("product.deleted", [uid]))
         return True
 
     async def catalog_list_products(
@@ -81,77 +201,101 @@ class ProductService:
         filters:  list[str] | None = None,
         name: str | None = None,
         sort: str = "uid",
+        cursor: str | None = None,
+        with_count: bool = True,
+        match: str = "contains",
     ) -> dict:
+        params = {
+            "page": page, "page_size": page_size, "filters": filters, "name": name, "sort": sort,
+            "cursor": cursor, "with_count": with_count, "match": match,
+        }
+        return await self._cached("catalog", params, lambda: self._catalog_list_products(**params))
 
-        parsed_filters = {}
-        if filters:
-            for filter_str in filters:
-                key, value = filter_str.split(":", 1)
-                if key not in parsed_filters:
-                    parsed_filters[key] = []
-                parsed_filters[key].append(value)
+    async def _catalog_list_products(
+        self,
+        page: int,
+        page_size: int,
+        filters: list[str] | None,
+        name: str | None,
+        sort: str,
+        cursor: str | None,
+        with_count: bool,
+        match: str,
+    ) -> dict:
+        after = None
+        if cursor:
+            if page != 1:
+                raise HTTPException(status_code=400, detail="Use either page or cursor, not both")
+            after = decode_cursor(cursor, sort)
 
-        result = await self.repository.get_filtered_products(page, page_size, parsed_filters, name, sort)
+        parsed_filters, parsed_ranges = parse_filters(filters)
+        result = await self.repository.get_filtered_products(
+            page, page_size, parsed_filters, name, sort,
+            after=after, with_count=with_count, ranges=parsed_ranges, match=match, documents=True,
+        )
         return {
-            "products": [
-                ProductDTO(
-                    uid=p.uid,
-                    name=p.name,
-                    properties=[
-                        PropertyDTO(
-                            uid=prop.uid,
-                            name=prop.name,
-                            type=prop.type,
-                            values=[PropertyValueDTO(value_uid=v.value_uid, value=v.value) for v in prop.values]
-                        )
-                        for prop in p.properties
-                    ]
-                )
-                for p in result["products"]
-            ],
+            "products": result["products"],
             "count": result["count"],
+            "next_cursor": encode_cursor(sort, result["next_key"]) if result["next_key"] else None,
         }
 
     async def get_filter_statistics(
         self,
         filters: list[str] | None = None,
         name: str | None = None,
+        match: str = "contains",
     ) -> dict:
-        parsed_filters = {}
-        if filters:
-            for filter_str in filters:
-                key, value = filter_str.split(":", 1)
-                if key not in parsed_filters:
-                    parsed_filters[key] = []
-                parsed_filters[key].append(value)
-
-        filtered_products = await self.repository.get_filtered_products(filters=parsed_filters, name=name)
-
-        property_stats = {}
-        for product in filtered_products["products"]:
-            for prop in product.properties:
-                if prop.uid not in property_stats:
-                    property_stats[prop.uid] = {}
+        params = {"filters": filters, "name": name, "match": match}
+        return await self._cached("filter_statistics", params, lambda: self._get_filter_statistics(**params))
 
-                if prop.type == "int":
-
-                    values = [int(v.value) for v in prop.values]
-                    property_stats[prop.uid]["min_value"] = min(property_stats[prop.uid].get("min_value", float("inf")), min(values))
-                    property_stats[prop.uid]["max_value"] = max(property_stats[prop.uid].get("max_value", float("-inf")), max(values))
-                else:
+    async def _get_filter_statistics(self, filters: list[str] | None, name: str | None, match: str) -> dict:
+        parsed_filters, parsed_ranges = parse_filters(filters)
+        # Ревизия та же, что в ETag и ключе кэша: индекс фильтров отвечает, только если отражает именно её
+        return await self.repository.get_filter_statistics(
+            parsed_filters, name, ranges=parsed_ranges, match=match, revision=await self.catalog_revision(),
+        )
 
-                    for value in prop.values:
-                        property_stats[prop.uid][value.value] = property_stats[prop.uid].get(value.value, 0) + 1
+    async def rebuild_facet_index(self) -> bool:
+        return await self.repository.rebuild_facet_index()
 
+    async def get_changes(self, since: int | None = None, cursor: str | None = None, limit: int = 500) -> dict:
+        # Без since — полная выгрузка, включая надгробия; дальше клиент передаёт revision из ответа
+        if cursor:
+            if since is not None:
+                raise HTTPException(status_code=400, detail="Use either since or cursor, not both")
+            after = decode_cursor(cursor, "changes")
+        else:
+            after = (since if since is not None else -1, None)
+        result = await self.repository.get_changes(after, limit)
         return {
-            "count": filtered_products["count"],
-            **property_stats,
+            "products": result["products"],
+            "deleted": result["deleted"],
+            "properties": [{
+                "uid": p.uid,
+                "name": p.name,
+                "type": p.type,
+                "values": [{"value_uid": v.value_uid, "value": v.value} for v in p.values],
+            } for p in result["properties"]],
+            "deleted_properties": result["deleted_properties"],
+            "revision": result["revision"],
+            "next_cursor": encode_cursor("changes", result["next_key"]) if result["next_key"] else None,
         }
 
 
 class PropertyService:
-    def __init__(self, repository: PropertyRepository):
+    def __init__(self, repository: PropertyRepository, cache: Optional[ResponseCache] = None,
+                 events: Optional[EventBroker] = None):
         self.repository = repository
+        self.cache = cache
+        self.events = events
+
+    async def _invalidate_cache(self) -> None:
+        if self.cache is not None:
+            await self.cache.invalidate()
+
+    async def _publish(self, *changes: tuple) -> None:
+        if self.events is not None:
+            await self.events.publish(self.repository.last_revision, changes)
 
     async def list_properties(self) -> list[PropertyDTO]:
         properties = await self.repository.get_all()
@@ -167,9 +311,11 @@ class PropertyService:
             uid=property_dto.uid,
             name=property_dto.name,
             type=property_dto.type,
-            values=[PropertyValue(value_uid=v.value_uid, value=v.value) for v in property_dto.values]
+            values=tuple(PropertyValue(value_uid=v.value_uid, value=v.value) for v in property_dto.values)
         )
         created_property = await self.repository.create(domain_property)
+        await self._invalidate_cache()
+        await self._publish(("property.created", [created_property.uid]))
         return PropertyDTO(
             uid=created_property.uid,
             name=created_property.name,
@@ -178,5 +324,25 @@ class PropertyService:
         )
 
     async def remove_property(self, uid: str) -> bool:
-        await self.repository.delete(uid)
+        deleted = await self.repository.delete(uid)
+        await self._invalidate_cache()
+        if deleted:
+            await self._publish(("property.deleted", [uid]))
         return True
+
+
+class JobService:
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+
+    async def submit(self, kind: str, payload: Optional[dict] = None) -> JobDTO:
+        return JobDTO(**await self.queue.submit(kind, payload))
+
+    async def get_job(self, job_id: str) -> JobDTO:
+        job = await self.queue.backend.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return JobDTO(**job)
+
+    async def list_jobs(self, limit: int = 50) -> list[JobDTO]:
+        return [JobDTO(**job) for job in await self.queue.backend.list(limit)]
@@ -0,0 +1,143 @@
+"""Memory held by domain entities for a large result set, without the database.
+
+    python -m benchmarks.entities --products 100000 --properties 200 --per-product 5 --values 10
+
+"dataclass" is the old layout: plain dataclasses with a __dict__ and lists, a new object for every value
+of every product. "slots" are the current frozen slotted entities, still built one per row. "interned" is
+what the repositories do: EntityInterner shares equal values and properties within one result set.
+Rows are produced lazily with fresh strings, the way the driver returns them, so strings kept alive by
+the entities are counted too. The dataset has the same shape as benchmarks.generate with the same options.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional
+
+from benchmarks.generate import property_type, property_uid, value_text, value_uid, zipf_weights
+from domain.entities import EntityInterner, Product, Property, PropertyValue
+
+
+@dataclass
+class LegacyPropertyValue:
+    value: str
+    value_uid: Optional[str]
+
+
+@dataclass
+class LegacyProperty:
+    name: str
+    type: str
+    uid: Optional[str]
+    values: List[LegacyPropertyValue]
+
+
+@dataclass
+class LegacyProduct:
+    name: str
+    properties: List[LegacyProperty]
+    uid: Optional[str]
+
+
+def product_rows(args):
+    # Те же строки, что отдаёт product_value_rows: по строке на значение свойства товара
+    rng = random.Random(args.seed)
+    property_weights = zipf_weights(args.properties, args.skew)
+    value_weights = zipf_weights(args.values, args.skew)
+    per_product = min(args.per_product, args.properties)
+    for index in range(args.products):
+        chosen = set()
+        while len(chosen) < per_product:
+            chosen.update(rng.choices(range(args.properties), cum_weights=property_weights, k=per_product - len(chosen)))
+        uid, name = f"bench-{index:08d}", f"Product {index}"
+        rows = []
+        for p in sorted(chosen):
+            v = rng.choices(range(args.values), cum_weights=value_weights)[0]
+            rows.append((property_uid(p), f"Property {p}", property_type(p), value_uid(p, v), value_text(p, v)))
+        yield uid, name, rows
+
+
+def build_dataclass(args) -> list:
+    products = []
+    for uid, name, rows in product_rows(args):
+        properties = {}
+        for p_uid, p_name, p_type, v_uid, value in rows:
+            property = properties.get(p_uid)
+            if property is None:
+                property = properties[p_uid] = LegacyProperty(uid=p_uid, name=p_name, type=p_type, values=[])
+            property.values.append(LegacyPropertyValue(value_uid=v_uid, value=value))
+        products.append(LegacyProduct(uid=uid, name=name, properties=list(properties.values())))
+    return products
+
+
+def build_slots(args) -> list:
+    products = []
+    for uid, name, rows in product_rows(args):
+        properties = {}
+        for p_uid, p_name, p_type, v_uid, value in rows:
+            properties.setdefault(p_uid, (p_name, p_type, []))[2].append(PropertyValue(value_uid=v_uid, value=value))
+        products.append(Product(uid=uid, name=name, properties=tuple(
+            Property(uid=p_uid, name=p_name, type=p_type, values=tuple(values))
+            for p_uid, (p_name, p_type, values) in properties.items()
+        )))
+    return products
+
+
+def build_interned(args) -> list:
+    interner = EntityInterner()
+    products = []
+    for uid, name, rows in product_rows(args):
+        properties = {}
+        for p_uid, p_name, p_type, v_uid, value in rows:
+            properties.setdefault(p_uid, (p_name, p_type, []))[2].append(interner.value(v_uid, value))
+        products.append(Product(uid=uid, name=name, properties=tuple(
+            interner.property(p_uid, p_name, p_type, values)
+            for p_uid, (p_name, p_type, values) in properties.items()
+        )))
+    return products
+
+
+VARIANTS = {"dataclass": build_dataclass, "slots": build_slots, "interned": build_interned}
+
+
+def measure(build, args) -> dict:
+    gc.collect()
+    started = time.process_time()
+    build(args)
+    elapsed = time.process_time() - started
+
+    gc.collect()
+    tracemalloc.start()
+    products = build(args)
+    retained, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del products
+    return {"retained": retained, "peak": peak, "blocks": blocks, "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--properties", type=int, default=200)
+    parser.add_argument("--per-product", type=int, default=5)
+    parser.add_argument("--values", type=int, default=10)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {name: measure(build, args) for name, build in VARIANTS.items()}
+    base = results["dataclass"]
+    print(f"{args.products} products x {args.per_product} properties, "
+          f"dictionary {args.properties} properties x {args.values} values, skew {args.skew}")
+    print(f"{'variant':<10}{'retained MB':>14}{'bytes/product':>15}{'peak MB':>10}{'live blocks':>13}{'build s':>10}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['retained'] / 2 ** 20:>14.1f}{result['retained'] / args.products:>15.0f}"
+              f"{result['peak'] / 2 ** 20:>10.1f}{result['blocks']:>13}{result['seconds']:>10.2f}"
+              f"  ({result['retained'] / base['retained']:.0%} of dataclass)")
+
+
+if __name__ == "__main__":
+    main()
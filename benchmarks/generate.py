@@ -0,0 +1,136 @@
+"""Synthetic catalog for load tests, written straight into the configured Postgres with COPY.
+
+    python -m benchmarks.generate --products 100000 --properties 200 --per-product 5 --values 10 --skew 1.1
+
+Every generated row is prefixed with "bench-", so --reset removes a previous run without touching
+real data. --skew is the Zipf exponent for picking properties and values: 0 is uniform, around 1
+gives a few very popular facets and a long tail, which is what filter statistics see in practice.
+Half of the properties are "int" with numeric values, so range filters have something to work on.
+Only Postgres is supported: the repositories rely on ARRAY, ON CONFLICT and LATERAL json_agg.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+from infrastructure.db.database import engine
+
+PREFIX = "bench-"
+WORDS = (
+    "alpha", "bravo", "carbon", "delta", "echo", "fusion", "giga", "helix", "ion", "jet",
+    "kilo", "lumen", "micro", "nova", "omega", "pixel", "quantum", "radio", "sigma", "turbo",
+)
+
+
+def zipf_weights(size: int, skew: float) -> list[float]:
+    return list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(size)))
+
+
+def property_uid(index: int) -> str:
+    return f"{PREFIX}prop-{index:04d}"
+
+
+def value_uid(property_index: int, value_index: int) -> str:
+    return f"{PREFIX}value-{property_index:04d}-{value_index:03d}"
+
+
+def property_type(index: int) -> str:
+    return "int" if index % 2 else "str"
+
+
+def value_text(property_index: int, value_index: int) -> str:
+    return str(value_index * 10) if property_type(property_index) == "int" else f"value {value_index}"
+
+
+def product_rows(args, rng: random.Random, start: int, stop: int, revision: int):
+    property_weights = zipf_weights(args.properties, args.skew)
+    value_weights = zipf_weights(args.values, args.skew)
+    properties = range(args.properties)
+    per_product = min(args.per_product, args.properties)
+
+    products, links, values = [], [], []
+    for index in range(start, stop):
+        uid = f"{PREFIX}{index:08d}"
+        products.append((uid, f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {index}", revision))
+        chosen = set()
+        while len(chosen) < per_product:
+            chosen.update(rng.choices(properties, cum_weights=property_weights, k=per_product - len(chosen)))
+        for property_index in chosen:
+            links.append((uid, property_uid(property_index)))
+            value_index = rng.choices(range(args.values), cum_weights=value_weights)[0]
+            values.append((uid, property_uid(property_index), value_uid(property_index, value_index)))
+    return products, links, values
+
+
+async def reset(connection) -> None:
+    # product_property_values удаляются каскадом вместе с product_property
+    await connection.execute("DELETE FROM product_property WHERE product_uid LIKE $1", f"{PREFIX}%")
+    await connection.execute("DELETE FROM products WHERE uid LIKE $1", f"{PREFIX}%")
+    await connection.execute("DELETE FROM property_values WHERE property_uid LIKE $1", f"{PREFIX}%")
+    await connection.execute("DELETE FROM properties WHERE uid LIKE $1", f"{PREFIX}%")
+
+
+async def generate(args) -> None:
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    async with engine.connect() as sa_connection:
+        # COPY идёт мимо SQLAlchemy — берём соединение asyncpg из пула приложения
+        connection = (await sa_connection.get_raw_connection()).driver_connection
+        async with connection.transaction():
+            if args.reset:
+                await reset(connection)
+            # Новая ревизия сбрасывает ETag-и и кэш ответов у запущенного приложения, а строки набора
+            # получают её как change_seq и попадают в /v1/products/changes
+            revision = await connection.fetchval(
+                "UPDATE catalog_revision SET revision = revision + 1 WHERE id = 1 RETURNING revision"
+            )
+            await connection.copy_records_to_table(
+                "properties",
+                records=[(property_uid(p), f"Property {p}", property_type(p), revision) for p in range(args.properties)],
+                columns=["uid", "name", "type", "change_seq"],
+            )
+            await connection.copy_records_to_table(
+                "property_values",
+                records=[
+                    (value_uid(p, v), value_text(p, v), property_uid(p))
+                    for p in range(args.properties)
+                    for v in range(args.values)
+                ],
+                columns=["value_uid", "value", "property_uid"],
+            )
+            for start in range(0, args.products, args.batch_size):
+                products, links, values = product_rows(
+                    args, rng, start, min(start + args.batch_size, args.products), revision,
+                )
+                await connection.copy_records_to_table(
+                    "products", records=products, columns=["uid", "name", "change_seq"],
+                )
+                await connection.copy_records_to_table(
+                    "product_property", records=links, columns=["product_uid", "property_uid"],
+                )
+                await connection.copy_records_to_table(
+                    "product_property_values", records=values, columns=["product_uid", "property_uid", "value_uid"],
+                )
+                print(f"\r{start + len(products)}/{args.products} products", end="", flush=True)
+        for table in ("products", "properties", "property_values", "product_property", "product_property_values"):
+            await connection.execute(f"ANALYZE {table}")
+    await engine.dispose()
+    print(f"\ndone in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--properties", type=int, default=200, help="size of the property dictionary")
+    parser.add_argument("--per-product", type=int, default=5, help="properties linked to each product")
+    parser.add_argument("--values", type=int, default=10, help="values per property")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent, 0 for uniform")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--reset", action="store_true", help="delete a previous bench-* dataset first")
+    asyncio.run(generate(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Fixed-concurrency load against the catalog endpoints, with baselines for comparing branches.
+
+    python -m benchmarks.load --concurrency 16 --duration 20 --save main
+    git switch my-branch
+    python -m benchmarks.load --concurrency 16 --duration 20 --compare main
+
+Without --url the app runs in-process through ASGI, with the settings from the environment/.env.
+With --url a running server is driven over HTTP. Uids, filters and page counts come from the API
+itself, so any dataset works. benchmarks.generate builds a reproducible one.
+Queries per request are read from the server's /metrics (METRICS_ENABLED), as a before/after diff.
+The "create" scenario writes real products into the database.
+Baselines live in benchmarks/baselines/<name>.json. Keep them per machine: the numbers only mean
+something against a run on the same host and dataset.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+SCENARIOS = ("catalog", "filter", "product", "create")
+ROUTES = {
+    "catalog": "/v1/catalog/",
+    "filter": "/v1/catalog/filter/",
+    "product": "/v1/products/product/{uid}",
+    "create": "/v1/products/",
+}
+METRIC_LINE = re.compile(r'^catalog_http_request_db_queries_(sum|count)\{method="(\w+)",route="([^"]+)"\} (\S+)$')
+
+
+class Dataset:
+    def __init__(self, count: int, uids: list[str], filters: list[str]):
+        self.count = count
+        self.uids = uids
+        self.filters = filters
+
+    @classmethod
+    async def discover(cls, client: httpx.AsyncClient, sample_pages: int) -> "Dataset":
+        uids, cursor, count = [], None, 0
+        for _ in range(sample_pages):
+            params = {"page_size": 100, "with_count": cursor is None}
+            if cursor:
+                params["cursor"] = cursor
+            page = (await client.get("/v1/catalog/", params=params)).raise_for_status().json()
+            count = page["count"] if page["count"] is not None else count
+            uids += [product["uid"] for product in page["products"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        filters = []
+        statistics = (await client.get("/v1/catalog/filter/")).raise_for_status().json()
+        for property_uid, stats in statistics.items():
+            if not isinstance(stats, dict):
+                continue
+            if "min_value" in stats:
+                middle = (stats["min_value"] + stats["max_value"]) / 2
+                filters.append(f"{property_uid}:gte:{middle}")
+            else:
+                filters += [f"{property_uid}:{value}" for value in stats]
+        if not uids:
+            raise SystemExit("The catalog is empty, run python -m benchmarks.generate first")
+        return cls(count, uids, filters)
+
+
+def build_request(scenario: str, dataset: Dataset, rng: random.Random) -> tuple[str, str, dict]:
+    if scenario == "catalog":
+        pages = max(1, min(50, dataset.count // 20))
+        params = {"page": rng.randint(1, pages), "page_size": 20}
+        if dataset.filters and rng.random() < 0.5:
+            params["filters"] = rng.choice(dataset.filters)
+        return "GET", "/v1/catalog/", {"params": params}
+    if scenario == "filter":
+        params = {"filters": rng.choice(dataset.filters)} if dataset.filters and rng.random() < 0.5 else {}
+        return "GET", "/v1/catalog/filter/", {"params": params}
+    if scenario == "product":
+        return "GET", f"/v1/products/product/{rng.choice(dataset.uids)}", {}
+    body = {
+        "name": f"load {rng.randrange(10 ** 9)}",
+        "properties": [
+            {"name": f"load property {p}", "type": "str", "values": [{"value": f"value {rng.randrange(10)}"}]}
+            for p in range(3)
+        ],
+    }
+    return "POST", "/v1/products/", {"json": body}
+
+
+def percentile(latencies: list[float], fraction: float) -> float:
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+
+async def scrape_queries(client: httpx.AsyncClient) -> dict:
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return {}
+    totals = {}
+    for line in response.text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            kind, method, route, value = match.groups()
+            totals.setdefault((method, route), {})[kind] = float(value)
+    return totals
+
+
+async def run_scenario(client, scenario: str, dataset: Dataset, args) -> dict:
+    latencies, errors, requests = [], 0, 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(seed: int):
+        nonlocal errors, requests
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            method, url, kwargs = build_request(scenario, dataset, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            requests += 1
+            errors += failed
+
+    before = await scrape_queries(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(args.seed * 1000 + index) for index in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await scrape_queries(client)
+
+    key = ("POST" if scenario == "create" else "GET", ROUTES[scenario])
+    queries = None
+    if key in after:
+        delta_count = after[key].get("count", 0) - before.get(key, {}).get("count", 0)
+        delta_sum = after[key].get("sum", 0) - before.get(key, {}).get("sum", 0)
+        queries = round(delta_sum / delta_count, 2) if delta_count else None
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries_per_request": queries,
+    }
+
+
+@asynccontextmanager
+async def open_client(args):
+    timeout = httpx.Timeout(60.0)
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            yield client
+        return
+
+    from app import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            yield client
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None) -> None:
+    columns = {
+        "requests": "requests", "errors": "errors", "rps": "rps", "p50_ms": "p50 ms", "p95_ms": "p95 ms",
+        "p99_ms": "p99 ms", "queries_per_request": "queries/req",
+    }
+    print(f"{'scenario':<10}" + "".join(f"{label:>18}" for label in columns.values()))
+    for scenario, result in results.items():
+        cells = []
+        for column in columns:
+            value = result[column]
+            cell = "-" if value is None else str(value)
+            previous = (baseline or {}).get(scenario, {}).get(column)
+            if previous and value is not None and column not in ("requests", "errors"):
+                cell += f" ({(value - previous) / previous * 100:+.1f}%)"
+            cells.append(f"{cell:>18}")
+        print(f"{scenario:<10}" + "".join(cells))
+
+
+async def run(args) -> None:
+    baseline = None
+    if args.compare:
+        baseline = json.loads((BASELINES_DIR / f"{args.compare}.json").read_text())
+
+    async with open_client(args) as client:
+        dataset = await Dataset.discover(client, args.sample_pages)
+        print(f"dataset: {dataset.count} products, {len(dataset.uids)} sampled uids, {len(dataset.filters)} filters")
+        results = {}
+        for scenario in args.scenarios:
+            # Прогрев: соединения пула, индекс фасетов и кэш ответов не должны попадать в замер
+            await run_scenario(client, scenario, dataset, argparse.Namespace(**{**vars(args), "duration": args.warmup}))
+            results[scenario] = await run_scenario(client, scenario, dataset, args)
+
+    print_results(results, baseline["results"] if baseline else None)
+    if baseline:
+        print(f"compared with {args.compare} ({baseline['meta']['git']}, {baseline['meta']['created_at']})")
+    if args.save:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        meta = {
+            "git": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": args.url or "in-process",
+            "products": dataset.count,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+        }
+        path = BASELINES_DIR / f"{args.save}.json"
+        path.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+        print(f"saved {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; in-process ASGI when omitted")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS[:3]),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)} (create writes to the database)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds per scenario before measuring")
+    parser.add_argument("--sample-pages", type=int, default=10, help="pages of 100 uids for product lookups")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="NAME", help="write results to benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="print the change against a saved baseline")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""CPU cost of building one catalog page response, without the database.
+
+    python -m benchmarks.serialization --products 100 --properties 30 --values 3
+
+"dto" is the old path: rows -> domain entities -> ProductDTO -> response_model validation -> JSON.
+"document" is the current one: rows -> dict -> orjson (json when orjson is not installed).
+ORM hydration, which the old path also paid for, is not included, so the gap is a lower bound.
+"""
+import argparse
+import json
+import time
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from api.responses import dumps, orjson
+from application.dto import CatalogResponse, ProductDTO, PropertyDTO, PropertyValueDTO
+from domain.entities import EntityInterner, Product
+from infrastructure.db.repositories import build_documents
+
+
+def make_page(products: int, properties: int, values: int) -> tuple[list, list]:
+    page = [(f"product-{i:06d}", f"Product {i}") for i in range(products)]
+    rows = [
+        (uid, f"property-{p:03d}", f"Property {p}", "str", f"value-{p:03d}-{v}", f"value {v}")
+        for uid, _ in page
+        for p in range(properties)
+        for v in range(values)
+    ]
+    return page, rows
+
+
+def run_sync(coroutine):
+    # serialize_response для async-эндпоинта ничего не ждёт — выполняем корутину без event loop
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("serialize_response unexpectedly awaited")
+
+
+def dto_path(page: list, rows: list, field) -> bytes:
+    interner = EntityInterner()
+    properties = {uid: {} for uid, _ in page}
+    for product_uid, property_uid, property_name, property_type, value_uid, value in rows:
+        property = properties[product_uid].get(property_uid)
+        if property is None:
+            property = properties[product_uid][property_uid] = (property_name, property_type, [])
+        property[2].append(interner.value(value_uid, value))
+    domain = {
+        uid: Product(uid=uid, name=name, properties=tuple(
+            interner.property(property_uid, property_name, property_type, values)
+            for property_uid, (property_name, property_type, values) in properties[uid].items()
+        ))
+        for uid, name in page
+    }
+    content = {
+        "products": [
+            ProductDTO(
+                uid=p.uid,
+                name=p.name,
+                properties=[
+                    PropertyDTO(
+                        uid=prop.uid,
+                        name=prop.name,
+                        type=prop.type,
+                        values=[PropertyValueDTO(value_uid=v.value_uid, value=v.value) for v in prop.values],
+                    )
+                    for prop in p.properties
+                ],
+            )
+            for p in domain.values()
+        ],
+        "count": len(page),
+        "next_cursor": None,
+    }
+    payload = run_sync(serialize_response(field=field, response_content=content))
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def document_path(page: list, rows: list) -> bytes:
+    documents = {uid: {"uid": uid, "name": name, "properties": []} for uid, name in page}
+    return dumps({"products": build_documents(documents, rows), "count": len(page), "next_cursor": None})
+
+
+def measure(fn, repeat: int) -> float:
+    fn()
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--properties", type=int, default=30)
+    parser.add_argument("--values", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    page, rows = make_page(args.products, args.properties, args.values)
+    field = create_model_field(name="response", type_=CatalogResponse, mode="serialization")
+    assert json.loads(dto_path(page, rows, field)) == json.loads(document_path(page, rows))
+
+    dto_ms = measure(lambda: dto_path(page, rows, field), args.repeat)
+    document_ms = measure(lambda: document_path(page, rows), args.repeat)
+    print(f"page: {args.products} products x {args.properties} properties x {args.values} values, "
+          f"encoder: {'orjson' if orjson is not None else 'json'}")
+    print(f"dto:      {dto_ms:8.2f} ms CPU/request")
+    print(f"document: {document_ms:8.2f} ms CPU/request  ({dto_ms / document_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
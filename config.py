@@ -10,6 +10,71 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_LOG_LEVEL: str = "WARNING"
+
+    DB_REPLICA_URLS: str = ""
+    DB_REPLICA_SELECTION: str = "round_robin"
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    BULK_IMPORT_MAX_ITEMS: int = 50000
+    PRODUCT_BATCH_MAX_UIDS: int = 200
+    BULK_IMPORT_BATCH_SIZE: int = 1000
+    EXPORT_BATCH_SIZE: int = 1000
+    # "join": ключи страницы и плоский join свойств отдельными запросами; "json": одна выборка с json_agg
+    PRODUCT_FETCH_MODE: str = "join"
+
+    # "sql": все чтения из БД; "snapshot": каталог целиком в памяти процесса, БД — только для записи
+    CATALOG_ENGINE: str = "sql"
+    SNAPSHOT_POLL_INTERVAL: float = 5.0
+
+    FACET_INDEX_ENABLED: bool = True
+    FACET_INDEX_TTL: float = 60.0
+
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL: float = 30.0
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    METRICS_ENABLED: bool = True
+    # Отладка/тесты: заголовок X-Query-Count, предупреждения о повторяющихся запросах и превышении бюджета
+    QUERY_DEBUG: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 5
+    # JSON вида {"GET /v1/catalog/": 3}: ключ — метод и шаблон маршрута
+    QUERY_BUDGETS: dict[str, int] = {}
+
+    JOB_BACKEND: str = "memory"
+    JOB_CONCURRENCY: int = 2
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_HISTORY_LIMIT: int = 1000
+    # JOB_BACKEND=postgres: воркер продлевает аренду задачи, пока её выполняет; задачу с истёкшей арендой
+    # (процесс упал) забирает другой воркер
+    JOB_LEASE_SECONDS: float = 60.0
+
+    # /v1/catalog/stream: "memory" — события только этого процесса, "postgres" — всех воркеров через LISTEN/NOTIFY
+    EVENT_STREAM_BACKEND: str = "memory"
+    EVENT_STREAM_BUFFER: int = 256
+    EVENT_STREAM_HISTORY: int = 1000
+    EVENT_STREAM_MAX_SUBSCRIBERS: int = 10000
+    EVENT_STREAM_BATCH_SIZE: int = 100
+    EVENT_STREAM_HEARTBEAT: float = 15.0
+
+    # main.py: 0 воркеров — по числу CPU с учётом квоты cgroup. Пул соединений у каждого воркера свой:
+    # к БД открывается до SERVER_WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0
+    # Прогреть индекс фильтров / снапшот каталога до приёма запросов, а не на первом запросе
+    WARM_ON_STARTUP: bool = False
+    WARM_TIMEOUT: float = 120.0
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,23 +1,56 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Hashable, Iterable, Optional, Tuple
 
 
-@dataclass
+# Сущности неизменяемые и без __dict__: на больших выборках их миллионы, и одни и те же
+# значения и свойства повторяются у тысяч товаров — EntityInterner отдаёт им общий экземпляр
+@dataclass(frozen=True, slots=True)
 class PropertyValue:
     value: str
     value_uid: Optional[str]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Property:
     name: str
     type: str
     uid: Optional[str]
-    values: List[PropertyValue]
+    values: Tuple[PropertyValue, ...]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Product:
     name: str
-    properties: List[Property]
+    properties: Tuple[Property, ...]
     uid: Optional[str]
+
+
+class EntityInterner:
+    # Живёт одну выборку: словари растут вместе со словарём свойств, а не с числом товаров
+    __slots__ = ("_strings", "_values", "_properties")
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+        self._values: Dict[Tuple[Optional[str], str], PropertyValue] = {}
+        self._properties: Dict[Hashable, Property] = {}
+
+    def string(self, text: str) -> str:
+        return self._strings.setdefault(text, text)
+
+    def value(self, value_uid: Optional[str], value: str) -> PropertyValue:
+        key = (value_uid, value)
+        entity = self._values.get(key)
+        if entity is None:
+            entity = self._values[key] = PropertyValue(value=self.string(value), value_uid=value_uid)
+        return entity
+
+    def property(self, uid: Optional[str], name: str, type: str, values: Iterable[PropertyValue]) -> Property:
+        values = tuple(values)
+        # Значения уже интернированы, поэтому в ключе достаточно их id
+        key = (uid, name, type, *map(id, values))
+        entity = self._properties.get(key)
+        if entity is None:
+            entity = self._properties[key] = Property(
+                uid=uid, name=self.string(name), type=self.string(type), values=values,
+            )
+        return entity
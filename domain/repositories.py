@@ -1,25 +1,53 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from decimal import Decimal
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from domain.entities import Product, Property
 
 
 class ProductRepository(ABC):
+    # Ревизия каталога, зафиксированная последней записью через этот репозиторий
+    last_revision: Optional[int] = None
+
     @abstractmethod
     async def get_all(self) -> List[Product]:
         pass
 
+    @abstractmethod
+    def stream_all(self, batch_size: int = 1000) -> AsyncIterator[Product]:
+        pass
+
     @abstractmethod
     async def create(self, product: Product) -> Product:
         pass
 
+    @abstractmethod
+    async def bulk_create(self, products: List[Product]) -> List[dict]:
+        pass
+
     @abstractmethod
     async def delete(self, uid: str) -> None:
         pass
 
+    @abstractmethod
+    async def get_revision(self) -> int:
+        pass
+
     @abstractmethod
     async def get_by_uid(self, uid: str) -> Product:
         pass
 
+    @abstractmethod
+    async def get_document_by_uid(self, uid: str) -> dict:
+        pass
+
+    @abstractmethod
+    async def get_many(self, uids: List[str]) -> List[Product]:
+        pass
+
+    @abstractmethod
+    async def get_many_documents(self, uids: List[str]) -> List[dict]:
+        pass
+
     @abstractmethod
     async def get_filtered_products(
         self,
@@ -28,19 +56,37 @@ class ProductRepository(ABC):
         filters: Optional[Dict[str, List[str]]] = None,
         name: Optional[str] = None,
         sort: str = "uid",
+        after: Optional[tuple] = None,
+        with_count: bool = True,
+        ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+        match: str = "contains",
+        documents: bool = False,
     ) -> dict:
         pass
 
+    @abstractmethod
+    async def rebuild_facet_index(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_changes(self, after: Tuple[int, Optional[str]], limit: int) -> dict:
+        pass
+
     @abstractmethod
     async def get_filter_statistics(
         self,
         filters: Optional[Dict[str, List[str]]] = None,
         name: Optional[str] = None,
+        ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+        match: str = "contains",
+        revision: Optional[int] = None,
     ) -> dict:
         pass
 
 
 class PropertyRepository(ABC):
+    last_revision: Optional[int] = None
+
     @abstractmethod
     async def get_all(self) -> List[Property]:
         pass
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from config import settings
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def size(self) -> Optional[int]:
+        pass
+
+
+class InMemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        # Ответы прошлых ревизий больше никто не прочитает — освобождаем память сразу
+        self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._client.set(key, json.dumps(value, separators=(",", ":")), px=int(ttl * 1000))
+
+    async def clear(self) -> None:
+        # Ключи прошлых ревизий не читаются и истекают по TTL сами
+        pass
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class ResponseCache:
+    # Ключ включает ревизию каталога, прочитанную до загрузки ответа из того же источника (БД, реплика, снимок):
+    # тело под ключом N посчитано не раньше ревизии N, поэтому ETag и тело не расходятся ни между воркерами,
+    # ни при отставании реплики или снимка
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    @staticmethod
+    def make_key(namespace: str, revision: int, params: dict) -> str:
+        normalized = {
+            key: sorted(value) if isinstance(value, (list, tuple)) else value
+            for key, value in params.items()
+            if value is not None
+        }
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+        return f"catalog:{namespace}:{revision}:{digest}"
+
+    async def get_or_set(self, namespace: str, revision: int, params: dict,
+                         loader: Callable[[], Awaitable[Any]]) -> Any:
+        key = self.make_key(namespace, revision, params)
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+            return value
+        self.misses[namespace] = self.misses.get(namespace, 0) + 1
+        value = jsonable_encoder(await loader())
+        await self.backend.set(key, value, self.ttl)
+        return value
+
+    async def invalidate(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "namespaces": {
+                namespace: {
+                    "hits": self.hits.get(namespace, 0),
+                    "misses": self.misses.get(namespace, 0),
+                    "hit_ratio": round(
+                        self.hits.get(namespace, 0)
+                        / ((self.hits.get(namespace, 0) + self.misses.get(namespace, 0)) or 1),
+                        4,
+                    ),
+                }
+                for namespace in namespaces
+            },
+        }
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    if settings.CACHE_BACKEND == "none":
+        return None
+    if settings.CACHE_BACKEND == "redis":
+        backend = RedisCacheBackend(settings.CACHE_REDIS_URL)
+    else:
+        backend = InMemoryCacheBackend(settings.CACHE_MAX_ENTRIES)
+    return ResponseCache(backend, settings.CACHE_TTL)
+
+
+response_cache = build_response_cache()
@@ -1,8 +1,11 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import itertools
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from urllib.parse import quote_plus
 from config import settings
 from sqlalchemy.ext.asyncio import AsyncAttrs
+from infrastructure.db.engine import build_engine, configure_query_logging
 
 
 password = quote_plus(settings.DB_PASSWORD)
@@ -11,13 +14,46 @@ SQLALCHEMY_DATABASE_URL = (
     f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 )
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+configure_query_logging()
+engine = build_engine(SQLALCHEMY_DATABASE_URL, "primary")
 AsyncSessionLocal = async_sessionmaker(bind=engine,
                                        autoflush=False,
                                        autocommit=False,
                                        expire_on_commit=False)
 
 
+replica_engines = [
+    build_engine(url.strip(), f"replica-{index}")
+    for index, url in enumerate(url for url in settings.DB_REPLICA_URLS.split(",") if url.strip())
+]
+
+
+class ReplicaRouter:
+    def __init__(self, engines: list[AsyncEngine], strategy: str):
+        self.engines = engines
+        self.strategy = strategy
+        self.session_makers = [
+            async_sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
+            for engine in engines
+        ]
+        self._counter = itertools.count()
+
+    def choose(self) -> async_sessionmaker:
+        if not self.session_makers:
+            return AsyncSessionLocal
+        start = next(self._counter)
+        order = [(start + offset) % len(self.engines) for offset in range(len(self.engines))]
+        if self.strategy == "least_busy":
+            # При равной загрузке идём по кругу, чтобы простаивающие реплики не доставались одной
+            index = min(order, key=lambda i: self.engines[i].pool.checkedout())
+        else:
+            index = order[0]
+        return self.session_makers[index]
+
+
+replica_router = ReplicaRouter(replica_engines, settings.DB_REPLICA_SELECTION)
+
+
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
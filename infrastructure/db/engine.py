@@ -0,0 +1,96 @@
+import logging
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import settings
+from infrastructure.metrics import instrument_engine, observe_pool_wait
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    # Считаем, сколько запросы ждут соединение (включая открытие нового): при насыщении пула это время растёт первым
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.role = "primary"
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            observe_pool_wait(self.role, waited)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.role = self.role
+        return pool
+
+    def statistics(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+engines: dict[str, AsyncEngine] = {}
+
+
+def configure_query_logging() -> None:
+    # Вместо echo=True: уровень логгера решает, пишет ли SQLAlchemy каждый запрос (INFO) или молчит
+    logger = logging.getLogger("sqlalchemy.engine")
+    logger.setLevel(settings.DB_LOG_LEVEL.upper())
+    if logger.isEnabledFor(logging.INFO) and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+
+
+def build_engine(url: str, role: str) -> AsyncEngine:
+    connect_args = {}
+    if make_url(url).get_dialect().driver == "asyncpg":
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+        logging_name=role,
+    )
+    engine.pool.role = role
+    instrument_engine(engine)
+    engines[role] = engine
+    return engine
+
+
+def pool_statistics() -> dict:
+    return {
+        role: engine.pool.statistics() if isinstance(engine.pool, InstrumentedAsyncQueuePool) else {}
+        for role, engine in engines.items()
+    }
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import re
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.future import select
+
+from config import settings
+from domain.entities import Property as DomainProperty
+from infrastructure.db.database import AsyncSessionLocal
+from infrastructure.db.models import Product as DBProduct, Property as DBProperty, PropertyValue as DBPropertyValue, \
+    ProductPropertyValueAssociation, CatalogRevision, NUMERIC_VALUE_PATTERN
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_VALUE = re.compile(NUMERIC_VALUE_PATTERN)
+
+
+def json_number(value: Decimal):
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+# Предрасчитанная статистика фильтров: для каждого значения свойства битовая маска товаров (int как bitset,
+# бит = слот товара), у которых это значение есть. Запросы без фильтра и с фильтром по одному свойству
+# считаются пересечением масок и popcount. revision — ревизия каталога, которую отражает состояние.
+class FacetState:
+    def __init__(self, revision: int = 0):
+        self.revision = revision
+        self._slots: Dict[str, int] = {}
+        self._next_slot = 0
+        self._alive = 0
+        self._types: Dict[str, str] = {}
+        # property_uid -> {значение -> маска товаров}
+        self._members: Dict[str, Dict[str, int]] = {}
+        self._product_values: Dict[str, set] = {}
+
+    def _slot(self, product_uid: str) -> int:
+        slot = self._slots.get(product_uid)
+        if slot is None:
+            slot = self._slots[product_uid] = self._next_slot
+            self._next_slot += 1
+            self._alive |= 1 << slot
+        return slot
+
+    def _link(self, product_uid: str, property_uid: str, value: str):
+        members = self._members.get(property_uid)
+        if members is None:
+            return
+        members[value] = members.get(value, 0) | 1 << self._slot(product_uid)
+        self._product_values.setdefault(product_uid, set()).add((property_uid, value))
+
+    def add_property(self, property: DomainProperty):
+        self._types[property.uid] = property.type
+        self._members.setdefault(property.uid, {})
+
+    def add_product(self, product_uid: str, properties: Sequence[DomainProperty]):
+        self._slot(product_uid)
+        for property in properties:
+            self.add_property(property)
+            for value in property.values:
+                self._link(product_uid, property.uid, value.value)
+
+    def remove_product(self, product_uid: str):
+        slot = self._slots.pop(product_uid, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        self._alive &= mask
+        for property_uid, value in self._product_values.pop(product_uid, ()):
+            members = self._members.get(property_uid)
+            if members is not None and value in members:
+                members[value] &= mask
+
+    def remove_property(self, property_uid: str):
+        self._types.pop(property_uid, None)
+        self._members.pop(property_uid, None)
+        for values in self._product_values.values():
+            values.difference_update([key for key in values if key[0] == property_uid])
+
+    def statistics(self, filters: Optional[Dict[str, List[str]]] = None) -> dict:
+        selected = self._alive
+        for property_uid, values in (filters or {}).items():
+            members = self._members.get(property_uid, {})
+            selected = 0
+            for value in values:
+                selected |= members.get(value, 0)
+
+        property_stats = {}
+        for property_uid, members in self._members.items():
+            counts = {}
+            for value, value_members in members.items():
+                matched = (value_members & selected).bit_count()
+                if matched:
+                    counts[value] = matched
+            if not counts:
+                continue
+            stats = property_stats[property_uid] = {}
+            if self._types[property_uid] == "int":
+                numbers = [Decimal(v) for v in counts if NUMERIC_VALUE.match(v)]
+                if numbers:
+                    stats["min_value"] = json_number(min(numbers))
+                    stats["max_value"] = json_number(max(numbers))
+            else:
+                stats.update(counts)
+
+        return {
+            "count": selected.bit_count(),
+            **property_stats,
+        }
+
+
+async def load_facets(session: AsyncSession) -> FacetState:
+    # Все выборки в одной REPEATABLE READ транзакции, маски собираются в bytearray и переводятся в int
+    # один раз на значение: OR по растущему int на каждую связь стоил бы O(связей x товаров)
+    await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    revision = (await session.execute(select(CatalogRevision.revision).where(CatalogRevision.id == 1))).scalar()
+    state = FacetState(revision or 0)
+    for (uid,) in await session.execute(select(DBProduct.uid).where(DBProduct.deleted_at.is_(None))):
+        state._slot(uid)
+    live_properties = select(DBProperty.uid, DBProperty.type).where(DBProperty.deleted_at.is_(None))
+    for uid, type_ in await session.execute(live_properties):
+        state._types[uid] = type_
+        state._members[uid] = {}
+    values = {
+        value_uid: value
+        for value_uid, value in await session.execute(select(DBPropertyValue.value_uid, DBPropertyValue.value))
+    }
+
+    width = (state._next_slot + 7) // 8
+    bits: Dict[str, Dict[str, bytearray]] = {uid: {} for uid in state._members}
+    connection = await session.connection()
+    links = await connection.stream(
+        select(
+            ProductPropertyValueAssociation.product_uid,
+            ProductPropertyValueAssociation.property_uid,
+            ProductPropertyValueAssociation.value_uid,
+        )
+        .execution_options(yield_per=10000)
+    )
+    async for partition in links.partitions():
+        for product_uid, property_uid, value_uid in partition:
+            slot = state._slots.get(product_uid)
+            property_bits = bits.get(property_uid)
+            if slot is None or property_bits is None or value_uid not in values:
+                continue
+            value = values[value_uid]
+            data = property_bits.get(value)
+            if data is None:
+                data = property_bits[value] = bytearray(width)
+            data[slot >> 3] |= 1 << (slot & 7)
+            state._product_values.setdefault(product_uid, set()).add((property_uid, value))
+    for property_uid, property_bits in bits.items():
+        state._members[property_uid] = {value: int.from_bytes(data, "little") for value, data in property_bits.items()}
+    return state
+
+
+# Индекс перестраивается фоновой задачей. Запрос берёт статистику из индекса, только если тот отражает ровно
+# ревизию запроса (по ней строятся ETag и ключ кэша), иначе считает её в SQL и запускает перестройку.
+# Записи этого процесса применяются к состоянию, если идут сразу за его ревизией, и запоминаются, чтобы
+# повторить их на собранном; после записей других воркеров состояние отстаёт до перестройки.
+class FacetIndex:
+    def __init__(self, ttl: float, session_maker: async_sessionmaker):
+        self.ttl = ttl
+        self.session_maker = session_maker
+        self._state: Optional[FacetState] = None
+        self._loaded_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        # Записи, пришедшие во время перестройки; None — перестройки нет
+        self._pending: Optional[list] = None
+        self._stale = False
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    @property
+    def revision(self) -> Optional[int]:
+        return self._state.revision if self._state is not None else None
+
+    def ensure_loaded(self, revision: int) -> bool:
+        # True — индекс отражает ревизию запроса и им можно ответить
+        current = self.revision
+        if current is None or current < revision or time.monotonic() - self._loaded_at >= self.ttl:
+            self._schedule()
+        return current == revision
+
+    async def rebuild(self) -> bool:
+        if self._task is not None and not self._task.done():
+            # Идущая перестройка могла начаться до вызова — пусть соберёт индекс ещё раз
+            self._stale = True
+        await asyncio.shield(self._schedule())
+        return self.ready
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _schedule(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._reload(), name="facet-index")
+        return self._task
+
+    async def _reload(self) -> None:
+        try:
+            while True:
+                self._pending = []
+                self._stale = False
+                async with self.session_maker() as session:
+                    state = await load_facets(session)
+                if self._stale:
+                    continue
+                for revision, method, args in self._pending:
+                    self._replay(state, revision, method, args)
+                self._state = state
+                self._loaded_at = time.monotonic()
+                return
+        except Exception:
+            logger.exception("Failed to rebuild the facet index")
+        finally:
+            self._pending = None
+
+    @staticmethod
+    def _replay(state: FacetState, revision: int, method: str, args: tuple) -> None:
+        # Запись старше состояния в нём уже есть; после пропуска ревизии состояние не продвигается
+        if revision == state.revision + 1:
+            getattr(state, method)(*args)
+            state.revision = revision
+
+    def _apply(self, revision: int, method: str, *args) -> None:
+        if self._state is not None:
+            self._replay(self._state, revision, method, args)
+        if self._pending is not None:
+            self._pending.append((revision, method, args))
+
+    def invalidate(self):
+        # Текущее состояние уже неверно — до перестройки статистика считается в SQL
+        self._state = None
+        self._loaded_at = None
+        if self._pending is not None:
+            self._stale = True
+
+    def add_property(self, revision: int, property: DomainProperty):
+        self._apply(revision, "add_property", property)
+
+    def add_product(self, revision: int, product_uid: str, properties: Sequence[DomainProperty]):
+        self._apply(revision, "add_product", product_uid, properties)
+
+    def remove_product(self, revision: int, product_uid: str):
+        self._apply(revision, "remove_product", product_uid)
+
+    def remove_property(self, revision: int, property_uid: str):
+        self._apply(revision, "remove_property", property_uid)
+
+    def statistics(self, filters: Optional[Dict[str, List[str]]] = None) -> Optional[dict]:
+        if self._state is None or (filters and len(filters) > 1):
+            return None
+        return self._state.statistics(filters)
+
+
+facet_index = FacetIndex(settings.FACET_INDEX_TTL, AsyncSessionLocal)
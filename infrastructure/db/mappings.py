@@ -1,28 +1,31 @@
-from domain.entities import Product as DomainProduct, Property as DomainProperty, PropertyValue as DomainPropertyValue
+from typing import Optional
+
+from domain.entities import Product as DomainProduct, Property as DomainProperty, PropertyValue as DomainPropertyValue, \
+    EntityInterner
 from infrastructure.db.models import Product as DBProduct, Property as DBProperty, PropertyValue as DBPropertyValue
 from fastapi import HTTPException
 
 
-async def db_to_domain_product(db_product: DBProduct) -> DomainProduct:
-    print("Loading properties...")
+async def db_to_domain_product(db_product: DBProduct, interner: Optional[EntityInterner] = None) -> DomainProduct:
+    interner = interner or EntityInterner()
     properties = await db_product.awaitable_attrs.properties
-    print(f"Properties loaded: {len(properties)}")
+    # У товара только свои значения свойства, а не весь словарь значений Property.values
+    values_by_property = {}
+    for v in await db_product.awaitable_attrs.property_values:
+        values_by_property.setdefault(v.property_uid, []).append(v)
 
     return DomainProduct(
         uid=db_product.uid,
         name=db_product.name,
-        properties=[
-            DomainProperty(
-                uid=p.uid,
-                name=p.name,
-                type=p.type,
-                values=[
-                    DomainPropertyValue(value_uid=v.value_uid, value=v.value)
-                    for v in p.values
-                ]
+        properties=tuple(
+            interner.property(
+                p.uid,
+                p.name,
+                p.type,
+                (interner.value(v.value_uid, v.value) for v in values_by_property.get(p.uid, ())),
             )
-            for p in db_product.properties
-        ]
+            for p in properties
+        )
     )
 
 
@@ -31,10 +34,10 @@ async def db_to_domain_property(db_property: DBProperty) -> DomainProperty:
         uid=db_property.uid,
         name=db_property.name,
         type=db_property.type,
-        values=[
+        values=tuple(
             DomainPropertyValue(value_uid=v.value_uid, value=v.value)
             for v in db_property.values
-        ]
+        )
     )
 
 
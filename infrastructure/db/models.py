@@ -1,12 +1,24 @@
-from sqlalchemy import String, ForeignKey
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import String, ForeignKey, ForeignKeyConstraint, Index, Numeric, Computed, Integer, BigInteger, func, \
+    text, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from typing import List
+from typing import List, Optional
 from infrastructure.db.database import Base
 from uuid import uuid4
 
+NUMERIC_VALUE_PATTERN = r"^\s*-?[0-9]+(\.[0-9]+)?\s*$"
+SEARCH_TEXT_CONFIG = "simple"
+# Порядок uid и name в выдаче — побайтовый, как сравнение строк в Python у снимка, а не collation БД
+SORT_COLLATION = "C"
+
 
 class ProductPropertyAssociation(Base):
     __tablename__ = "product_property"
+    __table_args__ = (
+        Index("ix_product_property_property_uid_product_uid", "property_uid", "product_uid"),
+    )
 
     product_uid: Mapped[str] = mapped_column(
         String, ForeignKey("products.uid"), primary_key=True
@@ -16,11 +28,48 @@ class ProductPropertyAssociation(Base):
     )
 
 
+class ProductPropertyValueAssociation(Base):
+    # Значения конкретного товара: строка привязана к связи товар-свойство и удаляется вместе с ней
+    __tablename__ = "product_property_values"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["product_uid", "property_uid"],
+            ["product_property.product_uid", "product_property.property_uid"],
+            ondelete="CASCADE",
+        ),
+        Index("ix_product_property_values_property_uid_value_uid", "property_uid", "value_uid", "product_uid"),
+        Index("ix_product_property_values_value_uid_product_uid", "value_uid", "product_uid"),
+    )
+
+    product_uid: Mapped[str] = mapped_column(String, primary_key=True)
+    property_uid: Mapped[str] = mapped_column(String, primary_key=True)
+    value_uid: Mapped[str] = mapped_column(
+        String, ForeignKey("property_values.value_uid", ondelete="CASCADE"), primary_key=True
+    )
+
+
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_name_uid",
+              text(f'name COLLATE "{SORT_COLLATION}"'), text(f'uid COLLATE "{SORT_COLLATION}"')),
+        Index("ix_products_uid_sort", text(f'uid COLLATE "{SORT_COLLATION}"')),
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_products_name_lower_prefix", func.lower(text("name")).label("name_lower"),
+              postgresql_ops={"name_lower": "text_pattern_ops"}),
+        Index("ix_products_name_fts", func.to_tsvector(text(f"'{SEARCH_TEXT_CONFIG}'"), text("name")),
+              postgresql_using="gin"),
+        Index("ix_products_change_seq_uid", "change_seq", "uid"),
+    )
 
     uid: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid4()))
     name: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Удалённый товар остаётся строкой-надгробием для ленты изменений, его связи со свойствами удаляются
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # Ревизия каталога, в которой товар менялся последним, — ставится bump_revision
+    change_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
 
     properties: Mapped[List["Property"]] = relationship(
         "Property", back_populates="products", secondary="product_property",
@@ -28,13 +77,29 @@ class Product(Base):
         cascade="save-update",
     )
 
+    # Только чтение: строки product_property_values пишутся Core-запросами и удаляются каскадом в БД
+    property_values: Mapped[List["PropertyValue"]] = relationship(
+        "PropertyValue",
+        secondary="product_property_values",
+        primaryjoin="Product.uid == foreign(ProductPropertyValueAssociation.product_uid)",
+        secondaryjoin="PropertyValue.value_uid == foreign(ProductPropertyValueAssociation.value_uid)",
+        viewonly=True,
+    )
+
 
 class Property(Base):
     __tablename__ = "properties"
+    __table_args__ = (
+        Index("ix_properties_change_seq_uid", "change_seq", "uid"),
+    )
 
     uid: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid4()))
     name: Mapped[str] = mapped_column(String, nullable=False)
     type: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    change_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
 
     products: Mapped[List["Product"]] = relationship("Product",
                                                      back_populates="properties",
@@ -51,9 +116,48 @@ class Property(Base):
 
 class PropertyValue(Base):
     __tablename__ = "property_values"
+    __table_args__ = (
+        Index("ix_property_values_property_uid_value", "property_uid", "value"),
+        Index("ix_property_values_property_uid_numeric_value", "property_uid", "numeric_value"),
+    )
 
     value_uid: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid4()))
     value: Mapped[str] = mapped_column(String, nullable=False)
+    # Числовое представление значения для диапазонных фильтров, считается самой БД
+    numeric_value: Mapped[Optional[Decimal]] = mapped_column(
+        Numeric,
+        Computed(f"CASE WHEN value ~ '{NUMERIC_VALUE_PATTERN}' THEN value::numeric END", persisted=True),
+    )
     property_uid: Mapped[str] = mapped_column(ForeignKey("properties.uid"), nullable=False)
 
     property: Mapped["Property"] = relationship("Property", back_populates="values")
+
+
+class CatalogRevision(Base):
+    __tablename__ = "catalog_revision"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    revision: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Воркеры забирают самую старую задачу из очереди — частичный индекс только по ожидающим
+        Index("ix_jobs_queued_created_at", "created_at", postgresql_where=text("status = 'queued'")),
+        Index("ix_jobs_created_at", "created_at"),
+        Index("ix_jobs_running_locked_until", "locked_until", postgresql_where=text("status = 'running'")),
+    )
+
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid4()))
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued")
+    payload: Mapped[Optional[dict]] = mapped_column(JSONB)
+    progress: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[Optional[int]] = mapped_column(Integer)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB)
+    error: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,86 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    # Параметры asyncpg уже вынесены в $n::TYPE — сворачиваем их и списки значений,
+    # чтобы запросы, отличающиеся только числом аргументов IN/VALUES, считались одинаковыми
+    shape = re.sub(r"\s+", " ", statement).strip()
+    shape = re.sub(r"\$\d+(::\w+(\[\])?)?", "?", shape)
+    shape = re.sub(r"\?(, \?)+", "?", shape)
+    return re.sub(r"\(\?\)(, \(\?\))+", "(?)", shape)
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Counter:
+        return Counter(statement_shape(statement) for statement in self.statements)
+
+    def repeated(self, threshold: Optional[int] = None) -> Dict[str, int]:
+        # Один и тот же запрос много раз за запрос — почти всегда ленивая загрузка или запрос в цикле
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return {shape: count for shape, count in self.shapes().most_common() if count >= threshold}
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements"]
+        lines += [f"{count:>4} x {shape[:200]}" for shape, count in self.shapes().most_common()]
+        return "\n".join(lines)
+
+    def assert_budget(self, max_queries: int) -> None:
+        if self.count > max_queries:
+            raise QueryBudgetExceeded(f"Expected at most {max_queries} statements, got {self.report()}")
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryLog]:
+    # Для тестов: ловит все запросы процесса внутри блока, в том числе вне HTTP-запроса.
+    # Слушатель ставится свой и не зависит от QUERY_DEBUG / METRICS_ENABLED
+    from infrastructure.db.engine import engines
+
+    log = QueryLog()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        log.statements.append(statement)
+
+    targets = [engine.sync_engine for engine in engines.values()]
+    for target in targets:
+        event.listen(target, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield log
+    finally:
+        for target in targets:
+            event.remove(target, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def expect_queries(max_queries: int) -> Iterator[QueryLog]:
+    with record_queries() as log:
+        yield log
+    log.assert_budget(max_queries)
+
+
+def check_request(method: str, route: str, log: QueryLog) -> None:
+    for shape, count in log.repeated().items():
+        logger.warning("Possible N+1 in %s %s: %d x %s", method, route, count, shape[:200])
+    budget = settings.QUERY_BUDGETS.get(f"{method} {route}")
+    if budget is not None and log.count > budget:
+        logger.warning("Query budget exceeded in %s %s: %d > %d\n%s", method, route, log.count, budget, log.report())
@@ -1,21 +1,124 @@
-from typing import List, Dict, Optional
+import json
+import logging
+from decimal import Decimal
+from dataclasses import replace
+from typing import AsyncIterator, List, Dict, Optional
 from uuid import uuid4
 
 from sqlalchemy.future import select
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, any_, literal, literal_column, tuple_, null, union_all, update, delete, true, \
+    JSON
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 from domain.repositories import ProductRepository
 from infrastructure.db.models import Product as DBProduct, Property as DBProperty, PropertyValue as DBPropertyValue, \
-    ProductPropertyAssociation
+    ProductPropertyAssociation, ProductPropertyValueAssociation, CatalogRevision, SEARCH_TEXT_CONFIG, \
+    SORT_COLLATION
 from infrastructure.db.mappings import db_to_domain_product, domain_to_db_product
+from infrastructure.db.facet_index import facet_index, json_number
+from infrastructure.db.snapshot import CHANGES_CHANNEL, SnapshotEngine
 from domain.entities import Property as DomainProperty
 from domain.entities import Product as DomainProduct
+from domain.entities import EntityInterner
 from domain.repositories import PropertyRepository
 from infrastructure.db.mappings import db_to_domain_property, domain_to_db_property
 from sqlalchemy.orm import selectinload
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import String
 from fastapi import HTTPException
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+RANGE_OPERATORS = {"gt": "__gt__", "gte": "__ge__", "lt": "__lt__", "lte": "__le__"}
+NOTIFY_PAYLOAD_LIMIT = 7000
+
+
+async def bump_revision(session: AsyncSession, products: Optional[List[str]] = None,
+                        properties: List[str] = ()) -> int:
+    # Вызывается прямо перед commit: строка ревизии блокируется только на время фиксации.
+    # Блокировка упорядочивает пишущие транзакции, поэтому change_seq растёт в порядке commit
+    stmt = (update(CatalogRevision).where(CatalogRevision.id == 1).values(revision=CatalogRevision.revision + 1)
+            .returning(CatalogRevision.revision))
+    if settings.CATALOG_ENGINE == "snapshot":
+        # Лента изменений для снимков каталога: NOTIFY уходит при commit, тем же запросом, что и новая ревизия.
+        # products=None (или слишком длинный список) — снимок сам найдёт изменённое по change_seq
+        changes = json.dumps({"products": products, "properties": list(properties)})
+        if len(changes) > NOTIFY_PAYLOAD_LIMIT:
+            changes = json.dumps({"products": None, "properties": []})
+        stmt = stmt.returning(func.pg_notify(CHANGES_CHANNEL, func.concat(CatalogRevision.revision, ":", changes)))
+    revision = (await session.execute(stmt)).scalar_one()
+    for model, uids in ((DBProduct, products), (DBProperty, properties)):
+        if uids:
+            await session.execute(
+                update(model)
+                .where(model.uid == any_(literal(list(uids), ARRAY(String))))
+                .values(change_seq=revision, updated_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+    return revision
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_condition(name: str, match: str):
+    # Каждый режим совпадает с выражением своего индекса из миграции 0004
+    if match == "prefix":
+        return func.lower(DBProduct.name).like(f"{escape_like(name.lower())}%", escape="\\")
+    if match == "fulltext":
+        config = literal_column(f"'{SEARCH_TEXT_CONFIG}'")
+        return func.to_tsvector(config, DBProduct.name).op("@@")(func.websearch_to_tsquery(config, name))
+    return DBProduct.name.ilike(f"%{escape_like(name)}%", escape="\\")
+
+
+def product_graph_options():
+    # Товар грузится со своими значениями; полный словарь значений свойства (Property.values) не нужен
+    return (
+        selectinload(DBProduct.properties).lazyload(DBProperty.values),
+        selectinload(DBProduct.property_values),
+    )
+
+
+def product_value_rows():
+    # Свойства товаров вместе с собственными значениями товара; свойство без значений даёт строку с value_uid = NULL.
+    # Порядок свойств и значений фиксирован — как в _documents_statement и снимке, иначе ответ (и ETag) плавает
+    return (
+        select(
+            ProductPropertyAssociation.product_uid,
+            DBProperty.uid,
+            DBProperty.name,
+            DBProperty.type,
+            DBPropertyValue.value_uid,
+            DBPropertyValue.value,
+        )
+        .join(DBProperty, DBProperty.uid == ProductPropertyAssociation.property_uid)
+        .outerjoin(ProductPropertyValueAssociation, and_(
+            ProductPropertyValueAssociation.product_uid == ProductPropertyAssociation.product_uid,
+            ProductPropertyValueAssociation.property_uid == ProductPropertyAssociation.property_uid,
+        ))
+        .outerjoin(DBPropertyValue, DBPropertyValue.value_uid == ProductPropertyValueAssociation.value_uid)
+        .order_by(ProductPropertyAssociation.property_uid, DBPropertyValue.value_uid)
+    )
+
+
+def build_documents(documents: dict[str, dict], rows) -> list[dict]:
+    # Строки плоского join (товар, свойство, значение) сразу собираются в dict ответа:
+    # без ORM-объектов, сущностей домена и DTO
+    properties = {}
+    for product_uid, property_uid, property_name, property_type, value_uid, value in rows:
+        property = properties.get((product_uid, property_uid))
+        if property is None:
+            property = properties[(product_uid, property_uid)] = {
+                "uid": property_uid, "name": property_name, "type": property_type, "values": [],
+            }
+            documents[product_uid]["properties"].append(property)
+        if value_uid is not None:
+            property["values"].append({"value_uid": value_uid, "value": value})
+    return list(documents.values())
 
 
 class SQLProductRepository(ProductRepository):
@@ -23,29 +126,63 @@ class SQLProductRepository(ProductRepository):
         self.session = session
 
     async def get_all(self) -> list[DomainProduct]:
-        stmt = select(DBProduct).options(
-            selectinload(DBProduct.properties).selectinload(DBProperty.values))
+        stmt = select(DBProduct).options(*product_graph_options()).where(DBProduct.deleted_at.is_(None))
         result = await self.session.execute(stmt)
         db_products = result.scalars().all()
-        return [await db_to_domain_product(p) for p in db_products]
+        return await self._to_domain(db_products)
+
+    async def stream_all(self, batch_size: int = 1000) -> AsyncIterator[DomainProduct]:
+        last_uid = None
+        while True:
+            stmt = (select(DBProduct.uid, DBProduct.name).where(DBProduct.deleted_at.is_(None))
+                    .order_by(DBProduct.uid.asc()).limit(batch_size))
+            if last_uid is not None:
+                stmt = stmt.where(DBProduct.uid > last_uid)
+            batch = (await self.session.execute(stmt)).all()
+            if not batch:
+                return
+            last_uid = batch[-1].uid
+
+            properties = {uid: {} for uid, _ in batch}
+            interner = EntityInterner()
+            rows = await self.session.stream(
+                product_value_rows()
+                .where(ProductPropertyAssociation.product_uid == any_(literal(list(properties), ARRAY(String))))
+                .execution_options(yield_per=batch_size)
+            )
+            async for product_uid, property_uid, property_name, property_type, value_uid, value in rows:
+                property = properties[product_uid].get(property_uid)
+                if property is None:
+                    property = properties[product_uid][property_uid] = (property_name, property_type, [])
+                if value_uid is not None:
+                    property[2].append(interner.value(value_uid, value))
+
+            for uid, name in batch:
+                yield DomainProduct(uid=uid, name=name, properties=tuple(
+                    interner.property(property_uid, property_name, property_type, values)
+                    for property_uid, (property_name, property_type, values) in properties[uid].items()
+                ))
 
     async def create(self, product: DomainProduct) -> DomainProduct:
 
         try:
 
             if product.uid is None:
-                product.uid = str(uuid4())
+                product = replace(product, uid=str(uuid4()))
 
             db_product = await self.session.get(
                 DBProduct,
                 product.uid,
-                options=[selectinload(DBProduct.properties)],
+                options=[selectinload(DBProduct.properties).lazyload(DBProperty.values)],
             )
+            changed_properties = []
             try:
                 if db_product is None:
                     db_product = DBProduct(uid=product.uid, name=product.name)
                     self.session.add(db_product)
                     await self.session.flush()
+                elif db_product.deleted_at is not None:
+                    db_product.deleted_at = None
 
             except Exception as e:
                 raise HTTPException(
@@ -63,6 +200,10 @@ class SQLProductRepository(ProductRepository):
                     )
                     self.session.add(db_property)
                     await self.session.flush()
+                    changed_properties.append(db_property.uid)
+                elif db_property.deleted_at is not None:
+                    db_property.deleted_at = None
+                    changed_properties.append(db_property.uid)
 
                 await self.session.execute(
                     insert(ProductPropertyAssociation)
@@ -75,14 +216,17 @@ class SQLProductRepository(ProductRepository):
 
                 try:
                     for value in property.values:
+                        # Значение без uid ищем по тексту, чтобы не плодить одинаковые значения свойства
                         stmt = (
                             select(DBPropertyValue)
                             .where(
                                 DBPropertyValue.property_uid == db_property.uid,
-                                DBPropertyValue.value_uid == value.value_uid,
+                                DBPropertyValue.value_uid == value.value_uid if value.value_uid is not None
+                                else DBPropertyValue.value == value.value,
                             )
+                            .limit(1)
                         )
-                        db_value = (await self.session.execute(stmt)).scalars().one_or_none()
+                        db_value = (await self.session.execute(stmt)).scalars().first()
 
                         if db_value is None:
                             db_value = DBPropertyValue(
@@ -91,6 +235,17 @@ class SQLProductRepository(ProductRepository):
                                 property_uid=db_property.uid,
                             )
                             self.session.add(db_value)
+                            await self.session.flush()
+
+                        await self.session.execute(
+                            insert(ProductPropertyValueAssociation)
+                            .values(
+                                product_uid=db_product.uid,
+                                property_uid=db_property.uid,
+                                value_uid=db_value.value_uid,
+                            )
+                            .on_conflict_do_nothing()
+                        )
 
                 except Exception as e:
                     raise HTTPException(
@@ -99,6 +254,9 @@ class SQLProductRepository(ProductRepository):
                     )
 
             try:
+                self.last_revision = await bump_revision(
+                    self.session, products=[db_product.uid], properties=changed_properties,
+                )
                 await self.session.commit()
             except Exception as e:
                 raise HTTPException(
@@ -108,8 +266,7 @@ class SQLProductRepository(ProductRepository):
 
             try:
 
-                stmt = (select(DBProduct).options(
-                    selectinload(DBProduct.properties).selectinload(DBProperty.values))
+                stmt = (select(DBProduct).options(*product_graph_options())
                         .where(DBProduct.uid == product.uid))
                 result = await self.session.execute(stmt)
                 db_product = result.scalar_one_or_none()
@@ -135,31 +292,383 @@ class SQLProductRepository(ProductRepository):
                     detail=f"LOCAL ->>>> Error db_to_domain_product: {e}",
                 )
 
+            facet_index.add_product(self.last_revision, result.uid, result.properties)
             return result
 
-        except Exception as e:
-            print(f"BASE >>>>> Error during product creation: {e}")
+        except Exception:
+            logger.exception("Error during product creation")
             await self.session.rollback()
             raise HTTPException(status_code=500, detail="An error occurred while creating the product.")
 
+    async def bulk_create(self, products: list[DomainProduct]) -> list[dict]:
+        results = []
+        changed_properties = set()
+        batch_size = settings.BULK_IMPORT_BATCH_SIZE
+        products = [p if p.uid is not None else replace(p, uid=str(uuid4())) for p in products]
+        for start in range(0, len(products), batch_size):
+            batch = products[start:start + batch_size]
+            try:
+                async with self.session.begin_nested():
+                    statuses, failed, batch_properties = await self._bulk_upsert_batch(batch)
+            except Exception as e:
+                detail = str(getattr(e, "orig", e))
+                results.extend({"uid": p.uid, "status": "failed", "detail": detail} for p in batch)
+            else:
+                results.extend(
+                    {"uid": p.uid, "status": "failed", "detail": failed[p.uid]} if p.uid in failed
+                    else {"uid": p.uid, "status": statuses[p.uid], "detail": None}
+                    for p in batch
+                )
+                changed_properties.update(batch_properties)
+        self.last_revision = await bump_revision(
+            self.session,
+            products=[r["uid"] for r in results if r["status"] != "failed"],
+            properties=list(changed_properties),
+        )
+        await self.session.commit()
+        # Пачка могла задеть значения многих свойств сразу — дешевле перечитать индекс целиком
+        facet_index.invalidate()
+        return results
+
+    async def _bulk_upsert_batch(
+        self, products: list[DomainProduct],
+    ) -> tuple[dict[str, str], dict[str, str], list[str]]:
+        referenced_properties = {
+            property.uid for product in products for property in product.properties if property.uid is not None
+        }
+        sent_value_uids = {
+            value.value_uid for product in products for property in product.properties
+            for value in property.values if value.value_uid is not None
+        }
+
+        # Один запрос на все уже существующие значения пачки вместо SELECT на каждое значение
+        known_values = {}
+        value_owners = {}
+        if referenced_properties or sent_value_uids:
+            stmt = select(DBPropertyValue.value_uid, DBPropertyValue.property_uid, DBPropertyValue.value).where(or_(
+                DBPropertyValue.property_uid == any_(literal(list(referenced_properties), ARRAY(String))),
+                DBPropertyValue.value_uid == any_(literal(list(sent_value_uids), ARRAY(String))),
+            ))
+            for value_uid, property_uid, value in await self.session.execute(stmt):
+                known_values.setdefault((property_uid, value), value_uid)
+                value_owners[value_uid] = (property_uid, value)
+
+        # Текст существующего значения не меняем молча: товар с расходящимся value_uid — ошибка этого товара
+        failed = {}
+        claimed = dict(value_owners)
+        for product in products:
+            conflicts = [
+                (value.value_uid, claimed[value.value_uid])
+                for property in product.properties for value in property.values
+                if value.value_uid in claimed and claimed[value.value_uid] != (property.uid, value.value)
+            ]
+            if conflicts:
+                value_uid, (property_uid, value) = conflicts[0]
+                failed[product.uid] = f"Value {value_uid} already exists as {value!r} of property {property_uid}"
+                continue
+            for property in product.properties:
+                for value in property.values:
+                    if value.value_uid is not None:
+                        claimed.setdefault(value.value_uid, (property.uid, value.value))
+        products = [product for product in products if product.uid not in failed]
+        if not products:
+            return {}, failed, []
+
+        product_rows = {}
+        property_rows = {}
+        link_rows = set()
+        product_values = []
+        values_by_property = {}
+        for product in products:
+            product_rows[product.uid] = {"uid": product.uid, "name": product.name}
+            for property in product.properties:
+                property_uid = property.uid
+                if property_uid is None:
+                    property_uid = str(uuid4())
+                property_rows.setdefault(property_uid, {
+                    "uid": property_uid,
+                    "name": property.name,
+                    "type": property.type,
+                })
+                link_rows.add((product.uid, property_uid))
+                values_by_property.setdefault(property_uid, []).extend(property.values)
+                product_values.extend((product.uid, property_uid, value) for value in property.values)
+
+        value_rows = []
+        known_value_uids = set(value_owners)
+        for property_uid, values in values_by_property.items():
+            for value in values:
+                if value.value_uid is not None:
+                    if value.value_uid not in known_value_uids:
+                        known_value_uids.add(value.value_uid)
+                        value_rows.append({
+                            "value_uid": value.value_uid,
+                            "value": value.value,
+                            "property_uid": property_uid,
+                        })
+                    continue
+                key = (property_uid, value.value)
+                if key not in known_values:
+                    known_values[key] = str(uuid4())
+                    value_rows.append({
+                        "value_uid": known_values[key],
+                        "value": value.value,
+                        "property_uid": property_uid,
+                    })
+
+        # Восстановленный из удалённых товар для клиента новый: ON CONFLICT сам этого не различает
+        revived = set((await self.session.execute(
+            select(DBProduct.uid).where(
+                DBProduct.uid == any_(literal(list(product_rows), ARRAY(String))), DBProduct.deleted_at.is_not(None),
+            )
+        )).scalars())
+        product_stmt = insert(DBProduct.__table__)
+        product_stmt = product_stmt.on_conflict_do_update(
+            index_elements=[DBProduct.uid],
+            set_={"name": product_stmt.excluded.name, "deleted_at": None},
+        ).returning(DBProduct.uid, literal_column("xmax = 0"))
+        upserted = await self.session.execute(product_stmt, list(product_rows.values()))
+        statuses = {uid: "created" if inserted or uid in revived else "updated" for uid, inserted in upserted}
+
+        changed_properties = []
+        if property_rows:
+            # Существующее свойство не трогаем, удалённое — восстанавливаем; RETURNING отдаёт новые и восстановленные
+            property_stmt = insert(DBProperty.__table__).on_conflict_do_update(
+                index_elements=[DBProperty.uid],
+                set_={"deleted_at": None},
+                where=DBProperty.__table__.c.deleted_at.is_not(None),
+            ).returning(DBProperty.uid)
+            changed = await self.session.execute(property_stmt, list(property_rows.values()))
+            changed_properties = list(changed.scalars())
+        if value_rows:
+            await self.session.execute(
+                insert(DBPropertyValue.__table__).on_conflict_do_nothing(index_elements=[DBPropertyValue.value_uid]),
+                value_rows,
+            )
+        if link_rows:
+            await self.session.execute(
+                insert(ProductPropertyAssociation.__table__).on_conflict_do_nothing(),
+                [{"product_uid": product_uid, "property_uid": property_uid} for product_uid, property_uid in link_rows],
+            )
+            # Значения переданных свойств товара заменяются целиком, значения остальных его свойств не трогаем
+            link_products, link_properties = zip(*link_rows)
+            links = func.unnest(
+                literal(list(link_products), ARRAY(String)), literal(list(link_properties), ARRAY(String)),
+            ).table_valued("product_uid", "property_uid").render_derived()
+            await self.session.execute(
+                delete(ProductPropertyValueAssociation).where(
+                    ProductPropertyValueAssociation.product_uid == links.c.product_uid,
+                    ProductPropertyValueAssociation.property_uid == links.c.property_uid,
+                )
+            )
+        value_links = {
+            (product_uid, property_uid, value.value_uid or known_values[(property_uid, value.value)])
+            for product_uid, property_uid, value in product_values
+        }
+        if value_links:
+            await self.session.execute(
+                insert(ProductPropertyValueAssociation.__table__).on_conflict_do_nothing(),
+                [
+                    {"product_uid": product_uid, "property_uid": property_uid, "value_uid": value_uid}
+                    for product_uid, property_uid, value_uid in value_links
+                ],
+            )
+        return statuses, failed, changed_properties
+
+    async def get_revision(self) -> int:
+        result = await self.session.execute(select(CatalogRevision.revision).where(CatalogRevision.id == 1))
+        return result.scalar_one_or_none() or 0
+
     async def get_by_uid(self, uid: str) -> DomainProduct:
-        stmt = select(DBProduct).options(selectinload(DBProduct.properties)).where(DBProduct.uid == uid)
+        stmt = (select(DBProduct).options(*product_graph_options())
+                .where(DBProduct.uid == uid, DBProduct.deleted_at.is_(None)))
         result = await self.session.execute(stmt)
         db_product = result.scalar_one_or_none()
         if not db_product:
             raise HTTPException(status_code=404, detail=f"Product with UID {uid} not found")
         return await db_to_domain_product(db_product)
 
+    async def get_document_by_uid(self, uid: str) -> dict:
+        documents = await self._fetch_documents(
+            select(DBProduct.uid, DBProduct.name).where(DBProduct.uid == uid, DBProduct.deleted_at.is_(None))
+        )
+        if not documents:
+            raise HTTPException(status_code=404, detail=f"Product with UID {uid} not found")
+        return documents[0]
+
+    async def get_many(self, uids: list[str]) -> list[DomainProduct]:
+        # Отсутствующие uid просто не попадают в результат, порядок восстанавливает вызывающий
+        stmt = (select(DBProduct).options(*product_graph_options())
+                .where(DBProduct.uid == any_(literal(uids, ARRAY(String))), DBProduct.deleted_at.is_(None)))
+        db_products = (await self.session.execute(stmt)).scalars().all()
+        return await self._to_domain(db_products)
+
+    async def get_many_documents(self, uids: list[str]) -> list[dict]:
+        return await self._fetch_documents(
+            select(DBProduct.uid, DBProduct.name)
+            .where(DBProduct.uid == any_(literal(uids, ARRAY(String))), DBProduct.deleted_at.is_(None))
+        )
+
+    async def _fetch_documents(self, page_stmt, order_by: tuple[str, ...] = ("uid",)) -> list[dict]:
+        # page_stmt выбирает uid и name товаров страницы вместе с фильтрами, сортировкой и лимитом
+        if settings.PRODUCT_FETCH_MODE == "json":
+            page = page_stmt.subquery()
+            stmt = self._documents_statement(page).order_by(
+                *(page.c[column].collate(SORT_COLLATION) for column in order_by)
+            )
+            return [
+                {"uid": uid, "name": name, "properties": properties}
+                for uid, name, properties in await self.session.execute(stmt)
+            ]
+        return await self._load_documents((await self.session.execute(page_stmt)).all())
+
+    @staticmethod
+    def _documents_statement(page):
+        # Страница товаров со свойствами и значениями за один запрос: каждый товар — одна строка,
+        # свойства собираются LATERAL-подзапросом в json, значения свойства — вложенным json_agg
+        values = (
+            select(func.coalesce(
+                func.json_agg(aggregate_order_by(func.json_build_object(
+                    "value_uid", DBPropertyValue.value_uid,
+                    "value", DBPropertyValue.value,
+                ), DBPropertyValue.value_uid)),
+                literal_column("'[]'::json"),
+            ))
+            .select_from(ProductPropertyValueAssociation)
+            .join(DBPropertyValue, DBPropertyValue.value_uid == ProductPropertyValueAssociation.value_uid)
+            .where(
+                ProductPropertyValueAssociation.product_uid == ProductPropertyAssociation.product_uid,
+                ProductPropertyValueAssociation.property_uid == ProductPropertyAssociation.property_uid,
+            )
+            .scalar_subquery()
+        )
+        properties = (
+            select(func.coalesce(
+                func.json_agg(aggregate_order_by(func.json_build_object(
+                    "uid", DBProperty.uid,
+                    "name", DBProperty.name,
+                    "type", DBProperty.type,
+                    "values", values,
+                ), DBProperty.uid)),
+                literal_column("'[]'::json"),
+                type_=JSON,
+            ).label("properties"))
+            .select_from(ProductPropertyAssociation)
+            .join(DBProperty, DBProperty.uid == ProductPropertyAssociation.property_uid)
+            .where(ProductPropertyAssociation.product_uid == page.c.uid)
+            .lateral()
+        )
+        return select(page.c.uid, page.c.name, properties.c.properties).select_from(page).join(properties, true())
+
+    async def _load_documents(self, products: list) -> list[dict]:
+        documents = {uid: {"uid": uid, "name": name, "properties": []} for uid, name in products}
+        if not documents:
+            return []
+        rows = await self.session.execute(
+            product_value_rows()
+            .where(ProductPropertyAssociation.product_uid == any_(literal(list(documents), ARRAY(String))))
+        )
+        return build_documents(documents, rows)
+
+    async def get_changes(self, after: tuple[int, Optional[str]], limit: int) -> dict:
+        # after — (ревизия, uid) последнего отданного товара или (since, None): всё, что новее ревизии since.
+        # Ревизию читаем первой: всё, что зафиксировано с change_seq <= until, к этому моменту уже видно.
+        # Документ может оказаться новее своей ревизии — следующая синхронизация просто отдаст его ещё раз
+        until = await self.get_revision()
+        since, after_uid = after
+        if after_uid is None:
+            lower = DBProduct.change_seq > since
+        else:
+            lower = tuple_(DBProduct.change_seq, DBProduct.uid) > tuple_(since, after_uid)
+        rows = (await self.session.execute(
+            select(DBProduct.uid, DBProduct.name, DBProduct.deleted_at, DBProduct.change_seq)
+            .where(lower, DBProduct.change_seq <= until)
+            .order_by(DBProduct.change_seq.asc(), DBProduct.uid.asc())
+            .limit(limit + 1)
+        )).all()
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1].change_seq, rows[-1].uid)
+            until = rows[-1].change_seq
+
+        live = [row.uid for row in rows if row.deleted_at is None]
+        documents = {}
+        if live:
+            page = select(DBProduct.uid, DBProduct.name).where(DBProduct.uid == any_(literal(live, ARRAY(String))))
+            documents = {document["uid"]: document for document in await self._fetch_documents(page)}
+
+        # Свойства отдаются окном ревизий той же страницы: (after, until], поэтому страницы их не дублируют
+        properties = (await self.session.execute(
+            select(DBProperty)
+            .options(selectinload(DBProperty.values))
+            .where(DBProperty.change_seq > since, DBProperty.change_seq <= until)
+            .order_by(DBProperty.change_seq.asc(), DBProperty.uid.asc())
+        )).scalars().all()
+        return {
+            "products": [documents[uid] for uid in live if uid in documents],
+            "deleted": [row.uid for row in rows if row.deleted_at is not None],
+            "properties": [await db_to_domain_property(p) for p in properties if p.deleted_at is None],
+            "deleted_properties": [p.uid for p in properties if p.deleted_at is not None],
+            "revision": until,
+            "next_key": next_key,
+        }
+
     async def delete(self, uid: str) -> bool:
-        stmt = select(DBProduct).where(DBProduct.uid == uid)
-        result = await self.session.execute(stmt)
-        db_product = result.scalar_one_or_none()
-        if not db_product:
+        # Строка товара остаётся надгробием для ленты изменений, связи удаляются (значения — каскадом)
+        stmt = (update(DBProduct).where(DBProduct.uid == uid, DBProduct.deleted_at.is_(None))
+                .values(deleted_at=func.now()).returning(DBProduct.uid))
+        if (await self.session.execute(stmt)).scalar_one_or_none() is None:
             return False
-        await self.session.delete(db_product)
+        await self.session.execute(
+            delete(ProductPropertyAssociation).where(ProductPropertyAssociation.product_uid == uid)
+        )
+        self.last_revision = await bump_revision(self.session, products=[uid])
         await self.session.commit()
+        facet_index.remove_product(self.last_revision, uid)
         return True
 
+    @staticmethod
+    def _apply_filters(
+            stmt,
+            filters: Optional[Dict[str, List[str]]],
+            name: Optional[str],
+            ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+            match: str = "contains",
+    ):
+        stmt = stmt.where(DBProduct.deleted_at.is_(None))
+        if name:
+            stmt = stmt.where(name_condition(name, match))
+
+        # Отдельный EXISTS на каждое свойство: значения одного свойства через OR, разные свойства через AND.
+        # Строки товара при этом не размножаются, поэтому LIMIT и count() считают товары, а не join-строки
+        for prop_uid, values in (filters or {}).items():
+            stmt = stmt.where(
+                select(ProductPropertyValueAssociation.product_uid)
+                .join(DBPropertyValue, DBPropertyValue.value_uid == ProductPropertyValueAssociation.value_uid)
+                .where(
+                    ProductPropertyValueAssociation.product_uid == DBProduct.uid,
+                    ProductPropertyValueAssociation.property_uid == prop_uid,
+                    DBPropertyValue.value.in_(values),
+                )
+                .exists()
+            )
+
+        for prop_uid, bounds in (ranges or {}).items():
+            conditions = [
+                ProductPropertyValueAssociation.product_uid == DBProduct.uid,
+                ProductPropertyValueAssociation.property_uid == prop_uid,
+            ]
+            for operator, bound in bounds.items():
+                conditions.append(getattr(DBPropertyValue.numeric_value, RANGE_OPERATORS[operator])(bound))
+            stmt = stmt.where(
+                select(ProductPropertyValueAssociation.product_uid)
+                .join(DBPropertyValue, DBPropertyValue.value_uid == ProductPropertyValueAssociation.value_uid)
+                .where(*conditions)
+                .exists()
+            )
+        return stmt
+
     async def get_filtered_products(
             self,
             page: int = 1,
@@ -167,106 +676,317 @@ class SQLProductRepository(ProductRepository):
             filters: Optional[Dict[str, List[str]]] = None,
             name: Optional[str] = None,
             sort: str = "uid",
+            after: Optional[tuple] = None,
+            with_count: bool = True,
+            ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+            match: str = "contains",
+            documents: bool = False,
     ) -> dict:
-        stmt = select(DBProduct).options(
-            selectinload(DBProduct.properties).selectinload(DBProperty.values)
-        )
-
-        if name:
-            stmt = stmt.where(DBProduct.name.ilike(f"%{name}%"))
+        if documents:
+            stmt = select(DBProduct.uid, DBProduct.name)
+        else:
+            stmt = select(DBProduct).options(*product_graph_options())
 
-        if filters:
-            filter_conditions = []
-            for prop_uid, values in filters.items():
-                property_condition = and_(
-                    DBProperty.uid == prop_uid,
-                    DBPropertyValue.value.in_(values),
-                )
-                filter_conditions.append(property_condition)
+        stmt = self._apply_filters(stmt, filters, name, ranges, match)
 
-            stmt = stmt.join(DBProduct.properties).join(DBProperty.values).where(and_(*filter_conditions))
+        total_count = None
+        if with_count:
+            total_count = await self.session.execute(select(func.count()).select_from(stmt.subquery()))
+            total_count = total_count.scalar_one()
 
+        # Keyset: uid служит тай-брейкером для сортировки по имени, поэтому ключ страницы всегда уникален.
+        # Сравнение и порядок — в SORT_COLLATION, как у снимка: курсор одного движка годится для другого
+        name_key, uid_key = DBProduct.name.collate(SORT_COLLATION), DBProduct.uid.collate(SORT_COLLATION)
         if sort == "name":
-            stmt = stmt.order_by(DBProduct.name.asc())
+            if after is not None:
+                stmt = stmt.where(tuple_(name_key, uid_key) > tuple_(*after))
+            stmt = stmt.order_by(name_key.asc(), uid_key.asc())
         else:
-            stmt = stmt.order_by(DBProduct.uid.asc())
+            if after is not None:
+                stmt = stmt.where(uid_key > after[0])
+            stmt = stmt.order_by(uid_key.asc())
 
-        total_count = await self.session.execute(select(func.count()).select_from(stmt.subquery()))
-        total_count = total_count.scalar_one()
+        stmt = stmt.offset((page - 1) * page_size).limit(page_size + 1)
 
-        stmt = stmt.offset((page - 1) * page_size).limit(page_size)
+        if documents:
+            db_products = await self._fetch_documents(stmt, ("name", "uid") if sort == "name" else ("uid",))
+        else:
+            db_products = (await self.session.execute(stmt)).scalars().all()
 
-        result = await self.session.execute(stmt)
-        db_products = result.unique().scalars().all()
+        next_key = None
+        if len(db_products) > page_size:
+            db_products = db_products[:page_size]
+            last = db_products[-1]
+            last_name, last_uid = (last["name"], last["uid"]) if documents else (last.name, last.uid)
+            next_key = (last_name, last_uid) if sort == "name" else (last_uid,)
 
         return {
-            "products": [await db_to_domain_product(p) for p in db_products],
+            "products": db_products if documents else await self._to_domain(db_products),
             "count": total_count,
+            "next_key": next_key,
         }
 
+    @staticmethod
+    async def _to_domain(db_products) -> list[DomainProduct]:
+        interner = EntityInterner()
+        return [await db_to_domain_product(p, interner) for p in db_products]
+
+    async def rebuild_facet_index(self) -> bool:
+        return await facet_index.rebuild()
+
     async def get_filter_statistics(
             self,
             filters: Optional[Dict[str, List[str]]] = None,
             name: Optional[str] = None,
+            ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+            match: str = "contains",
+            revision: Optional[int] = None,
     ) -> dict:
-
-        filtered_products = await self.get_filtered_products(filters=filters, name=name)
+        if settings.FACET_INDEX_ENABLED and not name and not ranges and len(filters or {}) <= 1:
+            if revision is None:
+                revision = await self.get_revision()
+            if facet_index.ensure_loaded(revision):
+                statistics = facet_index.statistics(filters)
+                if statistics is not None:
+                    return statistics
+
+        product_uids = None
+        if filters or name or ranges:
+            product_uids = self._apply_filters(select(DBProduct.uid), filters, name, ranges, match).subquery()
+
+        if product_uids is not None:
+            count_stmt = select(func.count()).select_from(product_uids)
+        else:
+            count_stmt = select(func.count()).select_from(DBProduct).where(DBProduct.deleted_at.is_(None))
+        total_count = (await self.session.execute(count_stmt)).scalar_one()
+
+        facets = (
+            select(
+                ProductPropertyValueAssociation.product_uid,
+                DBProperty.uid,
+                DBProperty.type,
+                DBPropertyValue.value,
+                DBPropertyValue.numeric_value,
+            )
+            .join(DBProperty, DBProperty.uid == ProductPropertyValueAssociation.property_uid)
+            .join(DBPropertyValue, DBPropertyValue.value_uid == ProductPropertyValueAssociation.value_uid)
+        )
+        if product_uids is not None:
+            facets = facets.where(ProductPropertyValueAssociation.product_uid.in_(select(product_uids.c.uid)))
+        facets = facets.subquery()
+
+        stmt = union_all(
+            select(facets.c.uid, facets.c.value, func.count(), null(), null())
+            .where(facets.c.type != "int")
+            .group_by(facets.c.uid, facets.c.value),
+            select(facets.c.uid, null(), null(), func.min(facets.c.numeric_value), func.max(facets.c.numeric_value))
+            .where(facets.c.type == "int")
+            .group_by(facets.c.uid),
+        )
 
         property_stats = {}
-        for product in filtered_products["products"]:
-            for prop in product.properties:
-                if prop.uid not in property_stats:
-                    property_stats[prop.uid] = {}
-
-                if prop.type == "int":
-                    values = [int(v.value) for v in prop.values]
-                    property_stats[prop.uid]["min_value"] = min(
-                        property_stats[prop.uid].get("min_value", float("inf")), min(values)
-                    )
-                    property_stats[prop.uid]["max_value"] = max(
-                        property_stats[prop.uid].get("max_value", float("-inf")), max(values)
-                    )
-                else:
-                    for value in prop.values:
-                        property_stats[prop.uid][value.value] = (
-                                property_stats[prop.uid].get(value.value, 0) + 1
-                        )
+        for property_uid, value, count, min_value, max_value in await self.session.execute(stmt):
+            stats = property_stats.setdefault(property_uid, {})
+            if count is not None:
+                stats[value] = count
+            elif min_value is not None:
+                stats["min_value"] = json_number(min_value)
+                stats["max_value"] = json_number(max_value)
 
         return {
-            "count": filtered_products["count"],
+            "count": total_count,
             **property_stats,
         }
 
 
+def document_to_domain_product(document: dict, interner: Optional[EntityInterner] = None) -> DomainProduct:
+    interner = interner or EntityInterner()
+    return DomainProduct(
+        uid=document["uid"],
+        name=document["name"],
+        properties=tuple(
+            interner.property(
+                p["uid"], p["name"], p["type"], (interner.value(v["value_uid"], v["value"]) for v in p["values"]),
+            )
+            for p in document["properties"]
+        ),
+    )
+
+
+class SnapshotProductRepository(ProductRepository):
+    # Чтения из снимка каталога в памяти, записи и всё, чего снимок не умеет (поиск по имени, выгрузка), — в SQL.
+    # Пока снимок не загружен, репозиторий целиком работает как SQLProductRepository
+    def __init__(self, repository: SQLProductRepository, engine: SnapshotEngine):
+        self.repository = repository
+        self.engine = engine
+
+    @property
+    def last_revision(self) -> Optional[int]:
+        return self.repository.last_revision
+
+    async def get_all(self) -> list[DomainProduct]:
+        return await self.repository.get_all()
+
+    def stream_all(self, batch_size: int = 1000) -> AsyncIterator[DomainProduct]:
+        return self.repository.stream_all(batch_size)
+
+    async def create(self, product: DomainProduct) -> DomainProduct:
+        return await self.repository.create(product)
+
+    async def bulk_create(self, products: list[DomainProduct]) -> list[dict]:
+        return await self.repository.bulk_create(products)
+
+    async def delete(self, uid: str) -> bool:
+        return await self.repository.delete(uid)
+
+    async def rebuild_facet_index(self) -> bool:
+        return await self.repository.rebuild_facet_index()
+
+    async def get_changes(self, after: tuple[int, Optional[str]], limit: int) -> dict:
+        return await self.repository.get_changes(after, limit)
+
+    async def get_revision(self) -> int:
+        # ETag должен описывать то, что отдаёт снимок, а не текущую ревизию БД
+        snapshot = self.engine.snapshot
+        if snapshot is None:
+            return await self.repository.get_revision()
+        return snapshot.revision
+
+    async def get_by_uid(self, uid: str) -> DomainProduct:
+        if self.engine.snapshot is None:
+            return await self.repository.get_by_uid(uid)
+        return document_to_domain_product(await self.get_document_by_uid(uid))
+
+    async def get_document_by_uid(self, uid: str) -> dict:
+        snapshot = self.engine.snapshot
+        if snapshot is None:
+            return await self.repository.get_document_by_uid(uid)
+        slot = snapshot.slot_of(uid)
+        if slot is None:
+            raise HTTPException(status_code=404, detail=f"Product with UID {uid} not found")
+        return snapshot.document(slot)
+
+    async def get_many(self, uids: list[str]) -> list[DomainProduct]:
+        if self.engine.snapshot is None:
+            return await self.repository.get_many(uids)
+        interner = EntityInterner()
+        return [document_to_domain_product(document, interner) for document in await self.get_many_documents(uids)]
+
+    async def get_many_documents(self, uids: list[str]) -> list[dict]:
+        snapshot = self.engine.snapshot
+        if snapshot is None:
+            return await self.repository.get_many_documents(uids)
+        slots = (snapshot.slot_of(uid) for uid in uids)
+        return [snapshot.document(slot) for slot in slots if slot is not None]
+
+    async def get_filtered_products(
+            self,
+            page: int = 1,
+            page_size: int = 10,
+            filters: Optional[Dict[str, List[str]]] = None,
+            name: Optional[str] = None,
+            sort: str = "uid",
+            after: Optional[tuple] = None,
+            with_count: bool = True,
+            ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+            match: str = "contains",
+            documents: bool = False,
+    ) -> dict:
+        snapshot = self.engine.snapshot
+        if snapshot is None or name:
+            return await self.repository.get_filtered_products(
+                page, page_size, filters, name, sort, after, with_count, ranges, match, documents,
+            )
+
+        mask = snapshot.filter_mask(filters, ranges)
+        slots = snapshot.page(mask, sort, after, (page - 1) * page_size, page_size + 1)
+        next_key = None
+        if len(slots) > page_size:
+            slots = slots[:page_size]
+            last = slots[-1]
+            next_key = (snapshot.names[last], snapshot.uids[last]) if sort == "name" else (snapshot.uids[last],)
+
+        products = [snapshot.document(slot) for slot in slots]
+        if not documents:
+            interner = EntityInterner()
+            products = [document_to_domain_product(p, interner) for p in products]
+        return {
+            "products": products,
+            "count": snapshot.mask_count(mask) if with_count else None,
+            "next_key": next_key,
+        }
+
+    async def get_filter_statistics(
+            self,
+            filters: Optional[Dict[str, List[str]]] = None,
+            name: Optional[str] = None,
+            ranges: Optional[Dict[str, Dict[str, Decimal]]] = None,
+            match: str = "contains",
+            revision: Optional[int] = None,
+    ) -> dict:
+        snapshot = self.engine.snapshot
+        if snapshot is None or name:
+            return await self.repository.get_filter_statistics(filters, name, ranges, match, revision)
+        return snapshot.statistics(snapshot.filter_mask(filters, ranges))
+
+
 class SQLPropertyRepository(PropertyRepository):
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def get_all(self) -> list[DomainProperty]:
-        stmt = select(DBProperty).options(selectinload(DBProperty.values))
+        stmt = select(DBProperty).options(selectinload(DBProperty.values)).where(DBProperty.deleted_at.is_(None))
         result = await self.session.execute(stmt)
         db_properties = result.scalars().all()
         return [await db_to_domain_property(p) for p in db_properties]
 
     async def create(self, property: DomainProperty) -> DomainProperty:
-        db_property = await domain_to_db_property(property)
-        self.session.add(db_property)
+        db_property = await self.session.get(DBProperty, property.uid) if property.uid is not None else None
+        if db_property is None:
+            db_property = await domain_to_db_property(property)
+            self.session.add(db_property)
+        elif db_property.deleted_at is None:
+            raise HTTPException(status_code=409, detail=f"Property with UID {property.uid} already exists")
+        else:
+            # Надгробие удалённого свойства оживает с новыми именем, типом и значениями
+            await self.session.execute(delete(DBPropertyValue).where(DBPropertyValue.property_uid == property.uid))
+            db_property.name = property.name
+            db_property.type = property.type
+            db_property.deleted_at = None
+            self.session.add_all(
+                DBPropertyValue(value_uid=v.value_uid, value=v.value, property_uid=property.uid)
+                for v in property.values
+            )
+        await self.session.flush()
+        self.last_revision = await bump_revision(self.session, products=[], properties=[db_property.uid])
         await self.session.commit()
         await self.session.refresh(db_property)
-        return await db_to_domain_property(db_property)
+        created_property = await db_to_domain_property(db_property)
+        facet_index.add_property(self.last_revision, created_property)
+        return created_property
 
     async def delete(self, uid: str) -> bool:
-        stmt = select(DBProperty).where(DBProperty.uid == uid)
-        result = await self.session.execute(stmt)
-        db_property = result.scalar_one_or_none()
-        if not db_property:
+        # Свойство остаётся надгробием вместе со своими значениями, у товаров оно пропадает —
+        # их документы изменились, поэтому они тоже попадают в ленту изменений
+        stmt = (update(DBProperty).where(DBProperty.uid == uid, DBProperty.deleted_at.is_(None))
+                .values(deleted_at=func.now()).returning(DBProperty.uid))
+        if (await self.session.execute(stmt)).scalar_one_or_none() is None:
             return False
-        await self.session.delete(db_property)
+        unlinked = await self.session.execute(
+            delete(ProductPropertyAssociation)
+            .where(ProductPropertyAssociation.property_uid == uid)
+            .returning(ProductPropertyAssociation.product_uid)
+        )
+        self.last_revision = await bump_revision(
+            self.session, products=list(unlinked.scalars()), properties=[uid],
+        )
         await self.session.commit()
+        facet_index.remove_property(self.last_revision, uid)
         return True
 
     async def get_by_uid(self, uid: str) -> DomainProperty:
-        stmt = select(DBProperty).options(selectinload(DBProperty.values)).where(DBProperty.uid == uid)
+        stmt = (select(DBProperty).options(selectinload(DBProperty.values))
+                .where(DBProperty.uid == uid, DBProperty.deleted_at.is_(None)))
         result = await self.session.execute(stmt)
         db_property = result.scalar_one_or_none()
         if not db_property:
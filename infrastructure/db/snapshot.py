@@ -0,0 +1,612 @@
+import asyncio
+import json
+import logging
+import operator
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, islice
+from typing import Dict, List, Optional
+
+from sqlalchemy import String, and_, any_, literal
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.future import select
+
+from config import settings
+from infrastructure.db.database import AsyncSessionLocal
+from infrastructure.db.facet_index import json_number
+from infrastructure.db.models import Product as DBProduct, Property as DBProperty, PropertyValue as DBPropertyValue, \
+    ProductPropertyAssociation, ProductPropertyValueAssociation, CatalogRevision
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "catalog_changes"
+RANGE_CHECKS = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+BIT_POSITIONS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+# Маска, в которой меньше 1/SPARSE_FACTOR товаров, разворачивается в список слотов и сортируется;
+# более плотная проходится по готовому порядку сортировки с проверкой бита. Тот же порог решает, как хранить
+# товары значения: 4 байта на слот в отсортированном массиве против бита на каждый товар каталога в маске
+SPARSE_FACTOR = 32
+# Подсчёт по товарам выборки (~1.5 мкс на товар) против AND + popcount маски каждого значения (~1 нс на 64 товара)
+TALLY_COST = 1500
+
+
+def slots_mask(slots) -> int:
+    # Отсортированные слоты -> битовая маска: биты ставятся в bytearray, в int переводится один раз
+    if not slots:
+        return 0
+    data = bytearray((slots[-1] >> 3) + 1)
+    for slot in slots:
+        data[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(data, "little")
+
+
+# Снимок каталога в памяти процесса. Товар — слот (индекс в uids/names), его свойства и значения — индексы
+# в параллельных списках свойств/значений. Связи загруженных товаров лежат в CSR-массивах (offsets + ids),
+# изменённые после загрузки — в overlay. Для каждого значения хранятся его товары: у редких значений —
+# отсортированный массив слотов, у частых — битовая маска слотов. Фильтры — OR/AND масок, счётчики — popcount.
+# Порядок uid и name — массивы слотов, отсортированные сравнением строк Python: посимвольно, как ORDER BY
+# в SORT_COLLATION у SQL-репозитория, поэтому страницы и курсоры двух движков совпадают.
+class CatalogSnapshot:
+    def __init__(self, revision: int):
+        self.revision = revision
+        self.version = 0
+
+        self.property_index: Dict[str, int] = {}
+        self.property_uids: List[Optional[str]] = []
+        self.property_names: List[str] = []
+        self.property_types: List[str] = []
+        self.property_values: List[List[int]] = []
+
+        self.value_index: Dict[str, int] = {}
+        self.value_uids: List[str] = []
+        self.value_texts: List[str] = []
+        self.value_numbers: list = []
+        self.value_property: List[int] = []
+        self.values_by_text: Dict[tuple, List[int]] = {}
+        # int — битовая маска слотов, array("I") — отсортированные слоты редкого значения
+        self.members: list = []
+
+        self.slots: Dict[str, int] = {}
+        self.uids: List[str] = []
+        self.names: List[str] = []
+        self.alive = 0
+        self.prop_offsets = array("I", [0])
+        self.prop_ids = array("I")
+        self.value_offsets = array("I", [0])
+        self.value_ids = array("I")
+        self.overlay: Dict[int, tuple] = {}
+        self.order_uid = array("I")
+        self.order_name = array("I")
+        self._statistics: Optional[tuple] = None
+
+    def add_property(self, uid: str, name: str, type_: str) -> int:
+        index = self.property_index.get(uid)
+        if index is None:
+            index = self.property_index[uid] = len(self.property_uids)
+            self.property_uids.append(uid)
+            self.property_names.append(name)
+            self.property_types.append(type_)
+            self.property_values.append([])
+        else:
+            self.property_names[index] = name
+            self.property_types[index] = type_
+        return index
+
+    def add_value(self, value_uid: str, property_index: int, text: str, number) -> int:
+        index = self.value_index.get(value_uid)
+        if index is not None:
+            return index
+        index = self.value_index[value_uid] = len(self.value_uids)
+        self.value_uids.append(value_uid)
+        self.value_texts.append(text)
+        self.value_numbers.append(number)
+        self.value_property.append(property_index)
+        self.values_by_text.setdefault((property_index, text), []).append(index)
+        self.property_values[property_index].append(index)
+        self.members.append(array("I"))
+        return index
+
+    def remove_property(self, uid: str) -> None:
+        index = self.property_index.pop(uid, None)
+        if index is None:
+            return
+        # Ссылки товаров на свойство остаются в CSR, но документы и счётчики его пропускают
+        self.property_uids[index] = None
+        for value in self.property_values[index]:
+            self.members[value] = array("I")
+            self.value_index.pop(self.value_uids[value], None)
+            self.values_by_text.pop((index, self.value_texts[value]), None)
+        self.property_values[index] = []
+        self.version += 1
+
+    def _links(self, slot: int) -> tuple:
+        links = self.overlay.get(slot)
+        if links is not None:
+            return links
+        if slot + 1 >= len(self.prop_offsets):
+            return (), ()
+        return (
+            self.prop_ids[self.prop_offsets[slot]:self.prop_offsets[slot + 1]],
+            self.value_ids[self.value_offsets[slot]:self.value_offsets[slot + 1]],
+        )
+
+    def _name_key(self, slot: int) -> tuple:
+        return self.names[slot], self.uids[slot]
+
+    def _insert_order(self, slot: int) -> None:
+        self.order_uid.insert(bisect_left(self.order_uid, self.uids[slot], key=self.uids.__getitem__), slot)
+        self.order_name.insert(bisect_left(self.order_name, self._name_key(slot), key=self._name_key), slot)
+
+    def _remove_order(self, slot: int) -> None:
+        for order, key in ((self.order_uid, self.uids.__getitem__), (self.order_name, self._name_key)):
+            position = bisect_left(order, key(slot), key=key)
+            # Порядок, разошедшийся со сравнением Python, удалил бы чужой слот — пусть лучше снимок перезагрузится
+            if position == len(order) or order[position] != slot:
+                raise RuntimeError(f"Catalog snapshot order lost slot {slot}")
+            del order[position]
+
+    def _add_member(self, value: int, slot: int) -> None:
+        members = self.members[value]
+        if isinstance(members, int):
+            self.members[value] = members | 1 << slot
+            return
+        position = bisect_left(members, slot)
+        if position < len(members) and members[position] == slot:
+            return
+        members.insert(position, slot)
+        if len(members) * SPARSE_FACTOR >= len(self.uids):
+            self.members[value] = slots_mask(members)
+
+    def _remove_member(self, value: int, slot: int) -> None:
+        members = self.members[value]
+        if isinstance(members, int):
+            self.members[value] = members & ~(1 << slot)
+            return
+        position = bisect_left(members, slot)
+        if position < len(members) and members[position] == slot:
+            del members[position]
+
+    def _mask(self, value: int) -> int:
+        members = self.members[value]
+        return members if isinstance(members, int) else slots_mask(members)
+
+    def _unlink(self, slot: int) -> None:
+        for value in self._links(slot)[1]:
+            self._remove_member(value, slot)
+
+    def put_product(self, uid: str, name: str, properties: List[int], values: List[int]) -> None:
+        slot = self.slots.get(uid)
+        if slot is None:
+            slot = self.slots[uid] = len(self.uids)
+            self.uids.append(uid)
+            self.names.append(name)
+            self.alive |= 1 << slot
+            self._insert_order(slot)
+        else:
+            self._unlink(slot)
+            if self.names[slot] != name:
+                self._remove_order(slot)
+                self.names[slot] = name
+                self._insert_order(slot)
+        self.overlay[slot] = (tuple(properties), tuple(values))
+        for value in values:
+            self._add_member(value, slot)
+        self.version += 1
+
+    def remove_product(self, uid: str) -> None:
+        slot = self.slots.pop(uid, None)
+        if slot is None:
+            return
+        self._unlink(slot)
+        self._remove_order(slot)
+        self.alive &= ~(1 << slot)
+        self.overlay[slot] = ((), ())
+        self.version += 1
+
+    @property
+    def count(self) -> int:
+        return len(self.order_uid)
+
+    def slot_of(self, uid: str) -> Optional[int]:
+        return self.slots.get(uid)
+
+    def document(self, slot: int) -> dict:
+        properties, values = self._links(slot)
+        grouped = {}
+        for value in values:
+            grouped.setdefault(self.value_property[value], []).append(
+                {"value_uid": self.value_uids[value], "value": self.value_texts[value]}
+            )
+        return {
+            "uid": self.uids[slot],
+            "name": self.names[slot],
+            "properties": [
+                {
+                    "uid": self.property_uids[property],
+                    "name": self.property_names[property],
+                    "type": self.property_types[property],
+                    "values": grouped.get(property, []),
+                }
+                for property in properties
+                if self.property_uids[property] is not None
+            ],
+        }
+
+    def filter_mask(self, filters: Optional[Dict[str, List[str]]], ranges: Optional[dict]) -> Optional[int]:
+        # None — фильтров нет, подходят все товары. Значения одного свойства через OR, свойства через AND
+        mask = None
+        for property_uid, texts in (filters or {}).items():
+            property = self.property_index.get(property_uid)
+            selected = 0
+            for text in texts if property is not None else ():
+                for value in self.values_by_text.get((property, text), ()):
+                    selected |= self._mask(value)
+            mask = selected if mask is None else mask & selected
+        for property_uid, bounds in (ranges or {}).items():
+            property = self.property_index.get(property_uid)
+            selected = 0
+            for value in self.property_values[property] if property is not None else ():
+                number = self.value_numbers[value]
+                if number is not None and all(RANGE_CHECKS[op](number, bound) for op, bound in bounds.items()):
+                    selected |= self._mask(value)
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    @staticmethod
+    def _slots_of(mask: int) -> List[int]:
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        slots = []
+        for match in NONZERO_BYTE.finditer(data):
+            base = match.start() * 8
+            slots.extend(base + bit for bit in BIT_POSITIONS[data[match.start()]])
+        return slots
+
+    def page(self, mask: Optional[int], sort: str, after: Optional[tuple], offset: int, limit: int) -> List[int]:
+        if sort == "name":
+            order, key, after_key = self.order_name, self._name_key, tuple(after) if after else None
+        else:
+            order, key, after_key = self.order_uid, self.uids.__getitem__, after[0] if after else None
+        start = bisect_right(order, after_key, key=key) if after_key is not None else 0
+
+        if mask is None:
+            return list(order[start + offset:start + offset + limit])
+
+        if mask.bit_count() * SPARSE_FACTOR < len(order):
+            slots = sorted(self._slots_of(mask), key=key)
+            if after_key is not None:
+                slots = slots[bisect_right(slots, after_key, key=key):]
+            return slots[offset:offset + limit]
+
+        bits = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        size = len(bits)
+        result = []
+        for slot in islice(order, start, None):
+            byte = slot >> 3
+            if byte < size and bits[byte] >> (slot & 7) & 1:
+                if offset:
+                    offset -= 1
+                    continue
+                result.append(slot)
+                if len(result) == limit:
+                    break
+        return result
+
+    def mask_count(self, mask: Optional[int]) -> int:
+        return self.count if mask is None else mask.bit_count()
+
+    def statistics(self, mask: Optional[int]) -> dict:
+        if mask is None and self._statistics is not None and self._statistics[0] == self.version:
+            return self._statistics[1]
+
+        if mask is None:
+            count = self.count
+            counts = [
+                members.bit_count() if isinstance(members, int) else len(members) for members in self.members
+            ]
+        else:
+            count = mask.bit_count()
+            if count * TALLY_COST < len(self.members) * (len(self.uids) >> 6):
+                counts = [0] * len(self.members)
+                for slot in self._slots_of(mask):
+                    for value in self._links(slot)[1]:
+                        counts[value] += 1
+            else:
+                bits = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+                size = len(bits)
+                counts = [
+                    (members & mask).bit_count() if isinstance(members, int)
+                    else sum(1 for slot in members if slot >> 3 < size and bits[slot >> 3] >> (slot & 7) & 1)
+                    for members in self.members
+                ]
+
+        property_stats = {}
+        for property, values in enumerate(self.property_values):
+            present = [value for value in values if counts[value]]
+            if not present:
+                continue
+            stats = property_stats[self.property_uids[property]] = {}
+            if self.property_types[property] == "int":
+                numbers = [self.value_numbers[value] for value in present if self.value_numbers[value] is not None]
+                if numbers:
+                    stats["min_value"] = json_number(min(numbers))
+                    stats["max_value"] = json_number(max(numbers))
+            else:
+                for value in present:
+                    text = self.value_texts[value]
+                    stats[text] = stats.get(text, 0) + counts[value]
+
+        result = {"count": count, **property_stats}
+        if mask is None:
+            self._statistics = (self.version, result)
+        return result
+
+
+def product_link_rows():
+    # Товар со всеми связями одной плоской выборкой: свойство без значений даёт строку с value_uid = NULL
+    return (
+        select(
+            DBProduct.uid, DBProduct.name,
+            DBProperty.uid, DBProperty.name, DBProperty.type,
+            DBPropertyValue.value_uid, DBPropertyValue.value, DBPropertyValue.numeric_value,
+        )
+        .outerjoin(ProductPropertyAssociation, ProductPropertyAssociation.product_uid == DBProduct.uid)
+        .outerjoin(DBProperty, DBProperty.uid == ProductPropertyAssociation.property_uid)
+        .outerjoin(ProductPropertyValueAssociation, and_(
+            ProductPropertyValueAssociation.product_uid == ProductPropertyAssociation.product_uid,
+            ProductPropertyValueAssociation.property_uid == ProductPropertyAssociation.property_uid,
+        ))
+        .outerjoin(DBPropertyValue, DBPropertyValue.value_uid == ProductPropertyValueAssociation.value_uid)
+        .where(DBProduct.deleted_at.is_(None))
+    )
+
+
+async def load_snapshot(session) -> CatalogSnapshot:
+    # Все выборки в одной REPEATABLE READ транзакции — снимок согласован с прочитанной ревизией.
+    # Разбор строк и сортировки идут в потоке (to_thread): на миллионах товаров это секунды,
+    # которые иначе блокировали бы event loop
+    await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    revision = (await session.execute(select(CatalogRevision.revision).where(CatalogRevision.id == 1))).scalar()
+    snapshot = CatalogSnapshot(revision or 0)
+
+    properties = select(DBProperty.uid, DBProperty.name, DBProperty.type).where(DBProperty.deleted_at.is_(None))
+    for uid, name, type_ in await session.execute(properties):
+        snapshot.add_property(uid, name, type_)
+    values = select(
+        DBPropertyValue.value_uid, DBPropertyValue.property_uid, DBPropertyValue.value, DBPropertyValue.numeric_value,
+    ).join(DBProperty, DBProperty.uid == DBPropertyValue.property_uid).where(DBProperty.deleted_at.is_(None))
+
+    def add_values(rows):
+        for value_uid, property_uid, text, number in rows:
+            snapshot.add_value(value_uid, snapshot.property_index[property_uid], text, number)
+
+    await asyncio.to_thread(add_values, (await session.execute(values)).all())
+
+    # Слоты раздаются в порядке выдачи БД — в нём же идут связи ниже, и CSR строится одним проходом
+    def add_products(partition):
+        for uid, name in partition:
+            snapshot.slots[uid] = len(snapshot.uids)
+            snapshot.uids.append(uid)
+            snapshot.names.append(name)
+
+    products = await session.stream(
+        select(DBProduct.uid, DBProduct.name).where(DBProduct.deleted_at.is_(None))
+        .order_by(DBProduct.uid).execution_options(yield_per=10000)
+    )
+    async for partition in products.partitions():
+        await asyncio.to_thread(add_products, partition)
+    size = len(snapshot.uids)
+
+    # Связи отсортированы по товару так же, как слоты — CSR строится одним проходом
+    prop_counts = [0] * size
+
+    def add_property_links(partition):
+        for product_uid, property_uid in partition:
+            prop_counts[snapshot.slots[product_uid]] += 1
+            snapshot.prop_ids.append(snapshot.property_index[property_uid])
+
+    links = await session.stream(
+        select(ProductPropertyAssociation.product_uid, ProductPropertyAssociation.property_uid)
+        .order_by(ProductPropertyAssociation.product_uid, ProductPropertyAssociation.property_uid)
+        .execution_options(yield_per=10000)
+    )
+    async for partition in links.partitions():
+        await asyncio.to_thread(add_property_links, partition)
+    snapshot.prop_offsets.extend(accumulate(prop_counts))
+
+    # Слоты приходят по возрастанию, поэтому массивы товаров значений сразу отсортированы
+    value_counts = [0] * size
+
+    def add_value_links(partition):
+        for product_uid, value_uid in partition:
+            slot = snapshot.slots[product_uid]
+            value = snapshot.value_index[value_uid]
+            value_counts[slot] += 1
+            snapshot.value_ids.append(value)
+            snapshot.members[value].append(slot)
+
+    value_links = await session.stream(
+        select(ProductPropertyValueAssociation.product_uid, ProductPropertyValueAssociation.value_uid)
+        .order_by(
+            ProductPropertyValueAssociation.product_uid,
+            ProductPropertyValueAssociation.property_uid,
+            ProductPropertyValueAssociation.value_uid,
+        )
+        .execution_options(yield_per=10000)
+    )
+    async for partition in value_links.partitions():
+        await asyncio.to_thread(add_value_links, partition)
+
+    def finish():
+        snapshot.value_offsets.extend(accumulate(value_counts))
+        snapshot.members = [
+            slots_mask(members) if len(members) * SPARSE_FACTOR >= size else members for members in snapshot.members
+        ]
+        snapshot.alive = (1 << size) - 1
+        # Выборка идёт в collation БД, а bisect сравнивает строки как Python — сортируем здесь
+        snapshot.order_uid = array("I", sorted(range(size), key=snapshot.uids.__getitem__))
+        snapshot.order_name = array("I", sorted(range(size), key=snapshot._name_key))
+
+    await asyncio.to_thread(finish)
+    return snapshot
+
+
+class SnapshotEngine:
+    # Подписка на канал изменений открывается раньше загрузки: всё, что закоммитят во время загрузки,
+    # придёт уведомлением с ревизией больше загруженной. Уведомления идут в порядке ревизий (их порядок
+    # задаёт блокировка строки catalog_revision), поэтому разрыв в номерах значит потерю — тогда перезагрузка.
+    def __init__(self, session_maker: async_sessionmaker, poll_interval: float):
+        self.session_maker = session_maker
+        self.poll_interval = poll_interval
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._changes: asyncio.Queue = asyncio.Queue()
+        self._listener = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot is not None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="catalog-snapshot")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close_listener()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+                await self.reload()
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Catalog snapshot lost its change feed, reconnecting")
+                await self._close_listener()
+                await asyncio.sleep(self.poll_interval)
+
+    async def _listen(self) -> None:
+        self._changes = asyncio.Queue()
+        self._listener = await self.session_maker.kw["bind"].connect()
+        connection = (await self._listener.get_raw_connection()).driver_connection
+        await connection.add_listener(CHANGES_CHANNEL, self._notified)
+
+    async def _close_listener(self) -> None:
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            try:
+                await listener.close()
+            except Exception:
+                logger.warning("Failed to close the catalog change listener", exc_info=True)
+
+    def _notified(self, connection, pid, channel, payload) -> None:
+        revision, _, changes = payload.partition(":")
+        self._changes.put_nowait((int(revision), json.loads(changes)))
+
+    async def reload(self) -> None:
+        async with self.session_maker() as session:
+            snapshot = await load_snapshot(session)
+        self.snapshot = snapshot
+        logger.info("Catalog snapshot loaded: %d products at revision %d", snapshot.count, snapshot.revision)
+
+    async def _follow(self) -> None:
+        while True:
+            try:
+                batch = [await asyncio.wait_for(self._changes.get(), self.poll_interval)]
+            except asyncio.TimeoutError:
+                # В канале тихо: сверяем ревизию — запись мимо API или оборванное соединение лечатся перезагрузкой
+                if (await self._listener.get_raw_connection()).driver_connection.is_closed():
+                    raise ConnectionError("change listener connection closed")
+                async with self.session_maker() as session:
+                    revision = (await session.execute(
+                        select(CatalogRevision.revision).where(CatalogRevision.id == 1)
+                    )).scalar() or 0
+                if revision != self.snapshot.revision and self._changes.empty():
+                    await self.reload()
+                continue
+            while not self._changes.empty():
+                batch.append(self._changes.get_nowait())
+            await self._apply(batch)
+
+    async def _apply(self, batch: list) -> None:
+        snapshot = self.snapshot
+        revision = snapshot.revision
+        products, properties = set(), set()
+        catch_up = False
+        for change_revision, changes in batch:
+            if change_revision <= revision:
+                continue
+            if change_revision != revision + 1:
+                await self.reload()
+                return
+            revision = change_revision
+            if changes.get("products") is None:
+                # Список не влез в уведомление: изменённое находим по change_seq
+                catch_up = True
+                continue
+            products.update(changes["products"])
+            properties.update(changes.get("properties", ()))
+        if revision == snapshot.revision:
+            return
+
+        async with self.session_maker() as session:
+            if catch_up:
+                # Строки, изменённые позже уведомлений пачки, применятся ещё раз по своим уведомлениям
+                for model, uids in ((DBProduct, products), (DBProperty, properties)):
+                    uids.update((await session.execute(
+                        select(model.uid).where(model.change_seq > snapshot.revision)
+                    )).scalars())
+            property_rows = value_rows = product_rows = ()
+            if properties:
+                uids = literal(list(properties), ARRAY(String))
+                property_rows = (await session.execute(
+                    select(DBProperty.uid, DBProperty.name, DBProperty.type)
+                    .where(DBProperty.uid == any_(uids), DBProperty.deleted_at.is_(None))
+                )).all()
+                value_rows = (await session.execute(
+                    select(
+                        DBPropertyValue.value_uid, DBPropertyValue.property_uid,
+                        DBPropertyValue.value, DBPropertyValue.numeric_value,
+                    )
+                    .join(DBProperty, DBProperty.uid == DBPropertyValue.property_uid)
+                    .where(DBPropertyValue.property_uid == any_(uids), DBProperty.deleted_at.is_(None))
+                )).all()
+            if products:
+                product_rows = (await session.execute(
+                    product_link_rows().where(DBProduct.uid == any_(literal(list(products), ARRAY(String))))
+                    .order_by(ProductPropertyAssociation.property_uid, DBPropertyValue.value_uid)
+                )).all()
+
+        # Дальше без await: читатели видят снимок либо до, либо после всей пачки изменений
+        for uid in properties - {uid for uid, _, _ in property_rows}:
+            snapshot.remove_property(uid)
+        for uid, name, type_ in property_rows:
+            snapshot.add_property(uid, name, type_)
+        for value_uid, property_uid, text, number in value_rows:
+            snapshot.add_value(value_uid, snapshot.property_index[property_uid], text, number)
+
+        found = {}
+        for uid, name, property_uid, property_name, property_type, value_uid, text, number in product_rows:
+            _, property_indexes, value_indexes = found.setdefault(uid, (name, [], []))
+            if property_uid is None:
+                continue
+            property = snapshot.add_property(property_uid, property_name, property_type)
+            if property not in property_indexes:
+                property_indexes.append(property)
+            if value_uid is not None:
+                value_indexes.append(snapshot.add_value(value_uid, property, text, number))
+        for uid in products - found.keys():
+            snapshot.remove_product(uid)
+        for uid, (name, property_indexes, value_indexes) in found.items():
+            snapshot.put_product(uid, name, property_indexes, value_indexes)
+        snapshot.revision = revision
+
+
+catalog_snapshot = SnapshotEngine(AsyncSessionLocal, settings.SNAPSHOT_POLL_INTERVAL)
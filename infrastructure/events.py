@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import String, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import settings
+from infrastructure.db.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "catalog_events"
+
+
+class Subscription:
+    __slots__ = ("queue", "overflowed", "since")
+
+    def __init__(self, buffer: int):
+        self.queue: asyncio.Queue = asyncio.Queue(buffer)
+        self.overflowed = False
+        # Ревизия, после которой клиенту надо догнать изменения через /v1/products/changes?since=
+        self.since: Optional[int] = None
+
+
+class EventBroker:
+    # События записи раздаются подписчикам в памяти процесса. Буфер каждого подписчика ограничен:
+    # медленный клиент не тормозит остальных и не копит память — его отключаем с событием resync.
+    # С session_maker события идут через LISTEN/NOTIFY и доходят до подписчиков всех воркеров
+    def __init__(self, buffer: int, history: int, max_subscribers: int, batch_size: int,
+                 session_maker: Optional[async_sessionmaker] = None):
+        self.buffer = buffer
+        self.max_subscribers = max_subscribers
+        self.batch_size = batch_size
+        self.session_maker = session_maker
+        self.subscribers: set = set()
+        # Недавние события для переподключения с Last-Event-ID
+        self.history: deque = deque(maxlen=history)
+        self.published = 0
+        self.dropped = 0
+        self._listener = None
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        if len(self.subscribers) >= self.max_subscribers:
+            raise HTTPException(status_code=503, detail="Too many event stream subscribers")
+        subscription = Subscription(self.buffer)
+        if self.history:
+            subscription.since = self.history[-1]["revision"] - 1
+        if last_event_id:
+            subscription.since = self.since_of(last_event_id)
+            missed = self._after(last_event_id)
+            if missed is None:
+                # Событие уже вытеснено из истории (или пришло от другого воркера) — догонять через ленту изменений
+                subscription.overflowed = True
+                return subscription
+            for event in missed:
+                if not self._offer(subscription, event):
+                    return subscription
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    def _after(self, event_id: str) -> Optional[list]:
+        for index, event in enumerate(self.history):
+            if event["id"] == event_id:
+                return list(self.history)[index + 1:]
+        return None
+
+    @staticmethod
+    def since_of(event_id: str) -> Optional[int]:
+        # id события — "ревизия.номер"; остальные события той же ревизии могли не дойти, поэтому since на одну меньше
+        try:
+            return int(event_id.split(".", 1)[0]) - 1
+        except ValueError:
+            return None
+
+    def _offer(self, subscription: Subscription, event: dict) -> bool:
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscription.overflowed = True
+            self.subscribers.discard(subscription)
+            self.dropped += 1
+            return False
+        return True
+
+    def dispatch(self, event: dict) -> None:
+        self.history.append(event)
+        for subscription in list(self.subscribers):
+            self._offer(subscription, event)
+
+    def resync_all(self) -> None:
+        # Часть событий могла потеряться (оборвался LISTEN) — всех подписчиков отправляем в ленту изменений
+        for subscription in list(self.subscribers):
+            subscription.overflowed = True
+        self.subscribers.clear()
+
+    def build_events(self, type_: str, revision: int, uids: List[str], first: int = 0) -> List[dict]:
+        # Большая запись режется на события по batch_size uid: и буфер подписчика, и payload NOTIFY ограничены
+        return [
+            {
+                "id": f"{revision}.{first + index}",
+                "type": type_,
+                "revision": revision,
+                "uids": uids[start:start + self.batch_size],
+            }
+            for index, start in enumerate(range(0, len(uids), self.batch_size))
+        ]
+
+    async def publish(self, revision: Optional[int], changes: Iterable[tuple]) -> None:
+        # changes — пары (тип события, uid-ы) одной записи; все события получают её ревизию
+        if revision is None:
+            return
+        events = []
+        for type_, uids in changes:
+            if uids:
+                events += self.build_events(type_, revision, list(uids), len(events))
+        if not events:
+            return
+        self.published += len(events)
+        if self.session_maker is None:
+            for event in events:
+                self.dispatch(event)
+            return
+        payloads = [json.dumps(event, separators=(",", ":")) for event in events]
+        try:
+            async with self.session_maker() as session:
+                await session.execute(select(func.pg_notify(
+                    EVENTS_CHANNEL, func.unnest(literal(payloads, ARRAY(String))),
+                )))
+                await session.commit()
+        except Exception:
+            # Запись уже зафиксирована — потерянное событие клиенты догонят через ленту изменений
+            logger.exception("Failed to publish catalog events for revision %s", revision)
+
+    def start(self) -> None:
+        if self.session_maker is not None:
+            self._task = asyncio.create_task(self._run(), name="catalog-events")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close_listener()
+        self.resync_all()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self._listener = await self.session_maker.kw["bind"].connect()
+                connection = (await self._listener.get_raw_connection()).driver_connection
+                await connection.add_listener(EVENTS_CHANNEL, self._notified)
+                while not connection.is_closed():
+                    await asyncio.sleep(settings.EVENT_STREAM_HEARTBEAT)
+                raise ConnectionError("event listener connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Catalog event listener failed, reconnecting")
+                await self._close_listener()
+                self.resync_all()
+                await asyncio.sleep(settings.EVENT_STREAM_HEARTBEAT)
+
+    async def _close_listener(self) -> None:
+        if self._listener is not None:
+            listener, self._listener = self._listener, None
+            try:
+                await listener.close()
+            except Exception:
+                logger.warning("Failed to close the catalog event listener", exc_info=True)
+
+    def _notified(self, connection, pid, channel, payload) -> None:
+        self.dispatch(json.loads(payload))
+
+
+def build_event_broker() -> EventBroker:
+    return EventBroker(
+        settings.EVENT_STREAM_BUFFER,
+        settings.EVENT_STREAM_HISTORY,
+        settings.EVENT_STREAM_MAX_SUBSCRIBERS,
+        settings.EVENT_STREAM_BATCH_SIZE,
+        AsyncSessionLocal if settings.EVENT_STREAM_BACKEND == "postgres" else None,
+    )
+
+
+event_broker = build_event_broker()
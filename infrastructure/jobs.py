@@ -0,0 +1,311 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from config import settings
+from infrastructure.db.database import AsyncSessionLocal
+from infrastructure.db.models import Job
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+Progress = Callable[[int, Optional[int]], Awaitable[None]]
+Handler = Callable[[dict, Progress], Awaitable[Optional[dict]]]
+
+
+class JobBackend(ABC):
+    @abstractmethod
+    async def submit(self, kind: str, payload: dict) -> dict:
+        pass
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def list(self, limit: int) -> List[dict]:
+        pass
+
+    @abstractmethod
+    async def claim(self) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def progress(self, job_id: str, done: int, total: Optional[int]) -> None:
+        pass
+
+    @abstractmethod
+    async def finish(self, job_id: str, result: Optional[dict], error: Optional[str]) -> None:
+        pass
+
+    @abstractmethod
+    async def release(self, job_id: str) -> None:
+        pass
+
+    @abstractmethod
+    async def heartbeat(self, job_id: str) -> None:
+        pass
+
+
+class InMemoryJobBackend(JobBackend):
+    # Задачи живут в памяти процесса: теряются при рестарте и видны только этому воркеру
+    def __init__(self, history: int):
+        self.history = history
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+
+    async def submit(self, kind: str, payload: dict) -> dict:
+        job = {
+            "id": str(uuid4()),
+            "kind": kind,
+            "status": "queued",
+            "payload": payload,
+            "progress": 0,
+            "total": None,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._jobs[job["id"]] = job
+        self._trim()
+        self._queue.put_nowait(job["id"])
+        return job
+
+    def _trim(self):
+        # Вытесняем только завершённые задачи, ожидающие и выполняющиеся остаются
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED_STATUSES]
+        for job_id in finished[:excess]:
+            del self._jobs[job_id]
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    async def list(self, limit: int) -> List[dict]:
+        return list(reversed(self._jobs.values()))[:limit]
+
+    async def claim(self) -> Optional[dict]:
+        job = self._jobs.get(await self._queue.get())
+        if job is None:
+            return None
+        job.update(status="running", started_at=datetime.now(timezone.utc))
+        return job
+
+    async def progress(self, job_id: str, done: int, total: Optional[int]) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(progress=done, total=total)
+
+    async def finish(self, job_id: str, result: Optional[dict], error: Optional[str]) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(
+                status="failed" if error else "succeeded",
+                result=result,
+                error=error,
+                payload=None,
+                finished_at=datetime.now(timezone.utc),
+            )
+
+    async def release(self, job_id: str) -> None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(status="queued", progress=0, total=None, started_at=None)
+            self._queue.put_nowait(job_id)
+
+    async def heartbeat(self, job_id: str) -> None:
+        # Задачи в памяти умирают вместе с процессом — продлевать нечего
+        pass
+
+
+class PostgresJobBackend(JobBackend):
+    # Очередь в таблице jobs: задачу забирает ровно один воркер любого процесса (FOR UPDATE SKIP LOCKED).
+    # Взятая задача арендуется до locked_until; аренду продлевает heartbeat, истёкшую забирает другой воркер
+    def __init__(self, session_maker: async_sessionmaker, lease_seconds: float):
+        self.session_maker = session_maker
+        self.lease_seconds = lease_seconds
+
+    def _lease(self):
+        return func.now() + timedelta(seconds=self.lease_seconds)
+
+    async def _execute(self, stmt) -> None:
+        async with self.session_maker() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def _execute_returning(self, stmt) -> Optional[dict]:
+        async with self.session_maker() as session:
+            row = (await session.execute(stmt)).mappings().first()
+            await session.commit()
+        return dict(row) if row is not None else None
+
+    async def submit(self, kind: str, payload: dict) -> dict:
+        return await self._execute_returning(
+            insert(Job)
+            .values(id=str(uuid4()), kind=kind, status="queued", payload=payload, progress=0)
+            .returning(*Job.__table__.c)
+        )
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        async with self.session_maker() as session:
+            row = (await session.execute(select(Job.__table__).where(Job.id == job_id))).mappings().first()
+        return dict(row) if row is not None else None
+
+    async def list(self, limit: int) -> List[dict]:
+        async with self.session_maker() as session:
+            rows = await session.execute(select(Job.__table__).order_by(Job.created_at.desc()).limit(limit))
+        return [dict(row) for row in rows.mappings()]
+
+    async def claim(self) -> Optional[dict]:
+        queued = (
+            select(Job.id)
+            .where(or_(
+                Job.status == "queued",
+                and_(Job.status == "running", Job.locked_until < func.now()),
+            ))
+            .order_by(Job.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return await self._execute_returning(
+            update(Job)
+            .where(Job.id == queued)
+            .values(status="running", started_at=func.now(), locked_until=self._lease())
+            .returning(*Job.__table__.c)
+        )
+
+    async def progress(self, job_id: str, done: int, total: Optional[int]) -> None:
+        await self._execute(
+            update(Job).where(Job.id == job_id).values(progress=done, total=total, locked_until=self._lease())
+        )
+
+    async def heartbeat(self, job_id: str) -> None:
+        await self._execute(
+            update(Job).where(Job.id == job_id, Job.status == "running").values(locked_until=self._lease())
+        )
+
+    async def finish(self, job_id: str, result: Optional[dict], error: Optional[str]) -> None:
+        await self._execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status="failed" if error else "succeeded",
+                result=result,
+                error=error,
+                payload=None,
+                finished_at=func.now(),
+                locked_until=None,
+            )
+        )
+
+    async def release(self, job_id: str) -> None:
+        await self._execute(
+            update(Job).where(Job.id == job_id)
+            .values(status="queued", progress=0, total=None, started_at=None, locked_until=None)
+        )
+
+
+class JobQueue:
+    def __init__(self, backend: JobBackend, concurrency: int, poll_interval: float, heartbeat_interval: float):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.handlers: Dict[str, Handler] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self.handlers[kind] = handler
+
+    async def submit(self, kind: str, payload: Optional[dict] = None) -> dict:
+        if kind not in self.handlers:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind {kind!r}")
+        return await self.backend.submit(kind, payload or {})
+
+    def start(self) -> None:
+        # Одновременно выполняется не больше concurrency задач на процесс
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{index}") for index in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await self.backend.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Не смогли записать итог задачи в хранилище — воркер продолжает работать
+                logger.exception("Failed to record the outcome of job %s", job["id"])
+
+    async def _run(self, job: dict) -> None:
+        async def progress(done: int, total: Optional[int] = None) -> None:
+            await self.backend.progress(job["id"], done, total)
+
+        handler = self.handlers.get(job["kind"])
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]), name=f"job-heartbeat-{job['id']}")
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for job kind {job['kind']!r}")
+            result = await handler(job["payload"] or {}, progress)
+        except asyncio.CancelledError:
+            # Остановка процесса посреди задачи — возвращаем её в очередь. Повторный запуск
+            # должен быть безопасен: обработчики работают с uid-ами, сохранёнными в payload
+            await self.backend.release(job["id"])
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+            await self.backend.finish(job["id"], None, str(getattr(e, "detail", e)))
+        else:
+            await self.backend.finish(job["id"], result, None)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.backend.heartbeat(job_id)
+            except Exception:
+                logger.warning("Failed to extend the lease of job %s", job_id, exc_info=True)
+
+
+def build_job_queue() -> JobQueue:
+    if settings.JOB_BACKEND == "postgres":
+        backend = PostgresJobBackend(AsyncSessionLocal, settings.JOB_LEASE_SECONDS)
+    else:
+        backend = InMemoryJobBackend(settings.JOB_HISTORY_LIMIT)
+    return JobQueue(backend, settings.JOB_CONCURRENCY, settings.JOB_POLL_INTERVAL, settings.JOB_LEASE_SECONDS / 3)
+
+
+job_queue = build_job_queue()
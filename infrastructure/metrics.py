@@ -0,0 +1,289 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import settings
+from infrastructure.db.query_budget import QueryLog, check_request
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+
+class Histogram:
+    # Счётчики по корзинам хранятся не накопительно: observe — это bisect и два сложения
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(float(bound))}"'
+                yield f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+        # Снимки чужих счётчиков (кэш, пул) считаются только в момент выдачи /metrics
+        self.collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "catalog_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+)
+http_request_duration = registry.histogram(
+    "catalog_http_request_duration_seconds", "HTTP request latency.", ("method", "route"),
+)
+request_db_queries = registry.histogram(
+    "catalog_http_request_db_queries", "SQL statements executed per request.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+request_db_duration = registry.histogram(
+    "catalog_http_request_db_seconds", "Time spent in SQL statements per request.", ("method", "route"),
+)
+request_pool_wait = registry.histogram(
+    "catalog_http_request_pool_wait_seconds", "Time spent waiting for a pooled connection per request.",
+    ("method", "route"),
+)
+request_serialization = registry.histogram(
+    "catalog_http_request_serialization_seconds", "Time spent encoding the response body per request.",
+    ("method", "route"),
+)
+db_pool_wait = registry.histogram(
+    "catalog_db_pool_wait_seconds", "Connection checkout wait, including connect.", ("role",),
+)
+
+
+def render_samples(name: str, documentation: str, kind: str, label: str, samples: Dict[str, float]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    lines.extend(f'{name}{{{label}="{key}"}} {format_value(value)}' for key, value in samples.items())
+    return lines
+
+
+def cache_collector(cache) -> Callable[[], List[str]]:
+    def collect() -> List[str]:
+        namespaces = cache.stats()["namespaces"]
+        lines = render_samples(
+            "catalog_cache_hits_total", "Response cache hits.", "counter", "namespace",
+            {namespace: stats["hits"] for namespace, stats in namespaces.items()},
+        )
+        lines += render_samples(
+            "catalog_cache_misses_total", "Response cache misses.", "counter", "namespace",
+            {namespace: stats["misses"] for namespace, stats in namespaces.items()},
+        )
+        if cache.backend.size() is not None:
+            lines += [
+                "# HELP catalog_cache_entries Entries held by the in-process cache.",
+                "# TYPE catalog_cache_entries gauge",
+                f"catalog_cache_entries {cache.backend.size()}",
+            ]
+        return lines
+
+    return collect
+
+
+def events_collector(broker) -> Callable[[], List[str]]:
+    def collect() -> List[str]:
+        return [
+            "# HELP catalog_event_stream_subscribers Open event stream connections.",
+            "# TYPE catalog_event_stream_subscribers gauge",
+            f"catalog_event_stream_subscribers {len(broker.subscribers)}",
+            "# HELP catalog_event_stream_published_total Catalog events published by this process.",
+            "# TYPE catalog_event_stream_published_total counter",
+            f"catalog_event_stream_published_total {broker.published}",
+            "# HELP catalog_event_stream_dropped_total Subscribers disconnected because their buffer overflowed.",
+            "# TYPE catalog_event_stream_dropped_total counter",
+            f"catalog_event_stream_dropped_total {broker.dropped}",
+        ]
+
+    return collect
+
+
+def pool_collector(statistics: Callable[[], dict]) -> Callable[[], List[str]]:
+    gauges = {
+        "checked_out": ("catalog_db_pool_checked_out", "Connections in use.", "gauge"),
+        "checked_in": ("catalog_db_pool_checked_in", "Idle connections in the pool.", "gauge"),
+        "overflow": ("catalog_db_pool_overflow", "Connections opened above pool_size.", "gauge"),
+        "timeouts": ("catalog_db_pool_timeouts_total", "Checkouts that failed or timed out.", "counter"),
+    }
+
+    def collect() -> List[str]:
+        pools = {role: stats for role, stats in statistics().items() if stats}
+        lines = []
+        for key, (name, documentation, kind) in gauges.items():
+            lines += render_samples(name, documentation, kind, "role", {role: stats[key] for role, stats in pools.items()})
+        return lines
+
+    return collect
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    serialization_seconds: float = 0.0
+    statements: Optional[QueryLog] = None
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def observe_pool_wait(role: str, seconds: float) -> None:
+    if not settings.METRICS_ENABLED:
+        return
+    db_pool_wait.observe(seconds, (role,))
+    stats = request_stats.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+
+def observe_serialization(seconds: float) -> None:
+    stats = request_stats.get()
+    if stats is not None:
+        stats.serialization_seconds += seconds
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    # События синхронного движка выполняются в greenlet-е запроса, поэтому видят его contextvars
+    if not (settings.METRICS_ENABLED or settings.QUERY_DEBUG):
+        return
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Время начала — на контексте выполнения, а не стеком в conn.info: для упавшего запроса
+        # after_cursor_execute не вызывается, и стек соединения из пула рос бы бесконечно
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            if started is not None:
+                stats.query_seconds += time.perf_counter() - started
+        if stats is not None and stats.statements is not None:
+            stats.statements.statements.append(statement)
+
+
+class MetricsMiddleware:
+    # Чистый ASGI-middleware: без BaseHTTPMiddleware и его лишней задачи на каждый запрос
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(statements=QueryLog() if settings.QUERY_DEBUG else None)
+        token = request_stats.set(stats)
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if stats.statements is not None:
+                    # У потоковых ответов (export) запросы идут и после заголовков — здесь только начальные
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-query-count", str(stats.queries).encode()),
+                    ]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_stats.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "<unmatched>")
+            if stats.statements is not None:
+                check_request(*labels, stats.statements)
+            # Без return: return в finally проглотил бы исключение приложения (и CancelledError)
+            if settings.METRICS_ENABLED:
+                http_requests.inc(labels + (status,))
+                http_request_duration.observe(elapsed, labels)
+                request_db_queries.observe(stats.queries, labels)
+                request_db_duration.observe(stats.query_seconds, labels)
+                request_pool_wait.observe(stats.pool_wait_seconds, labels)
+                request_serialization.observe(stats.serialization_seconds, labels)
@@ -0,0 +1,32 @@
+"""product sort collation
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 16:05:12.431877
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_products_name_uid', table_name='products')
+    op.create_index('ix_products_name_uid', 'products', [sa.text('name COLLATE "C"'), sa.text('uid COLLATE "C"')], unique=False)
+    op.create_index('ix_products_uid_sort', 'products', [sa.text('uid COLLATE "C"')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_uid_sort', table_name='products')
+    op.drop_index('ix_products_name_uid', table_name='products')
+    op.create_index('ix_products_name_uid', 'products', ['name', 'uid'], unique=False)
@@ -1,8 +1,76 @@
+import logging
+import math
+import os
+from typing import Optional
+
 from app import create_app
+from config import settings
 from uvicorn import run
 
 
 app = create_app()
 
+logger = logging.getLogger(__name__)
+
+
+def cpu_quota() -> Optional[int]:
+    # Лимит docker --cpus задаётся квотой cgroup, а не affinity: cgroup v2 (cpu.max), затем v1
+    for quota_path, period_path in (
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    ):
+        try:
+            with open(quota_path) as f:
+                values = f.read().split()
+            if period_path is not None:
+                with open(period_path) as f:
+                    values.append(f.read().strip())
+        except OSError:
+            continue
+        if len(values) < 2 or values[0] in ("max", "-1"):
+            return None
+        return max(1, math.ceil(int(values[0]) / int(values[1])))
+    return None
+
+
+def worker_count() -> int:
+    if settings.SERVER_WORKERS > 0:
+        return settings.SERVER_WORKERS
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = cpu_quota()
+    return min(cpus, quota) if quota else cpus
+
+
+def check_shared_state(workers: int) -> None:
+    # Состояние этих бэкендов живёт в памяти процесса и другим воркерам не видно: кэш отдавал бы устаревшие
+    # ответы, задача была бы видна одному воркеру, поток событий — только его записи
+    if workers == 1:
+        return
+    local = [
+        name for name, backend in (
+            ("CACHE_BACKEND", settings.CACHE_BACKEND),
+            ("JOB_BACKEND", settings.JOB_BACKEND),
+            ("EVENT_STREAM_BACKEND", settings.EVENT_STREAM_BACKEND),
+        )
+        if backend == "memory"
+    ]
+    if local:
+        raise SystemExit(
+            f"{workers} workers need shared backends, but {', '.join(local)}=memory; "
+            "set CACHE_BACKEND=redis, JOB_BACKEND=postgres, EVENT_STREAM_BACKEND=postgres or SERVER_WORKERS=1"
+        )
+
+
 if __name__ == "__main__":
-    run(app, host="0.0.0.0", port=8000)
+    logging.basicConfig(level=logging.INFO)
+    workers = worker_count()
+    check_shared_state(workers)
+    # Каждый воркер — отдельный процесс со своим event loop, пулом соединений и прогревом в lifespan;
+    # по SIGTERM воркеры перестают принимать соединения и дожидаются текущих запросов
+    run(
+        "main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+    )
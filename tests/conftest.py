@@ -0,0 +1,22 @@
+import httpx
+import pytest
+
+from app import create_app
+
+
+# Тесты ходят в базу из .env (DB_*), как и приложение: нужна поднятая БД с применёнными миграциями.
+# Пулы соединений и очереди приложения — синглтоны модулей, поэтому все тесты идут в одном event loop
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client():
+    app = create_app()
+    # ASGITransport не запускает lifespan — входим в него сами
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
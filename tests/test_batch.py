@@ -0,0 +1,41 @@
+from uuid import uuid4
+
+import pytest
+
+import api.dependencies
+from config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("mode", ["json", "join"])
+async def test_batch_keeps_request_order_and_reports_missing(client, monkeypatch, mode):
+    monkeypatch.setattr(api.dependencies, "response_cache", None)
+    monkeypatch.setattr(settings, "PRODUCT_FETCH_MODE", mode)
+    token = uuid4().hex
+    a, b, c, gone = (f"{token}-{suffix}" for suffix in "abcd")
+    response = await client.post("/v1/products/bulk", json=[
+        {"uid": uid, "name": uid, "properties": []} for uid in (a, b, c, gone)
+    ])
+    assert response.status_code == 200
+    assert (await client.delete(f"/v1/products/product/{gone}")).status_code == 204
+    client.cookies.clear()
+
+    # Порядок — порядок запроса, а не uid; повтор схлопывается, удалённый товар считается отсутствующим
+    response = await client.post("/v1/products/batch", json={"uids": [c, f"{token}-x", a, gone, c, b]})
+    assert response.status_code == 200
+    body = response.json()
+    assert [p["uid"] for p in body["products"]] == [c, a, b]
+    assert [p["name"] for p in body["products"]] == [c, a, b]
+    assert body["missing"] == [f"{token}-x", gone]
+
+
+async def test_batch_all_missing_and_limit(client, monkeypatch):
+    monkeypatch.setattr(api.dependencies, "response_cache", None)
+    missing = [uuid4().hex for _ in range(3)]
+    response = await client.post("/v1/products/batch", json={"uids": missing})
+    assert response.status_code == 200
+    assert response.json() == {"products": [], "missing": missing}
+
+    too_many = [uuid4().hex for _ in range(settings.PRODUCT_BATCH_MAX_UIDS + 1)]
+    assert (await client.post("/v1/products/batch", json={"uids": too_many})).status_code == 413
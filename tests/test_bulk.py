@@ -0,0 +1,45 @@
+from uuid import uuid4
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_reports_outcome_per_item(client):
+    token = uuid4().hex
+    existing, revived, new, conflicting, invalid = (f"{token}-{suffix}" for suffix in "abcde")
+    colour = {"uid": f"{token}-colour", "name": "Colour", "type": "str",
+              "values": [{"value_uid": f"{token}-red", "value": "red"}]}
+    response = await client.post("/v1/products/bulk", json=[
+        {"uid": existing, "name": "existing", "properties": [colour]},
+        {"uid": revived, "name": "revived", "properties": []},
+    ])
+    assert response.status_code == 200
+    assert (await client.delete(f"/v1/products/product/{revived}")).status_code == 204
+
+    # value_uid существующего значения с другим текстом — ошибка товара, а не молчаливая подмена
+    recoloured = {**colour, "values": [{"value_uid": f"{token}-red", "value": "blue"}]}
+    response = await client.post("/v1/products/bulk", json=[
+        {"uid": new, "name": "new", "properties": [colour]},
+        {"uid": existing, "name": "renamed", "properties": [colour]},
+        {"uid": conflicting, "name": "conflicting", "properties": [recoloured]},
+        {"uid": invalid, "properties": []},
+        {"uid": revived, "name": "revived again", "properties": []},
+    ])
+    assert response.status_code == 200
+    client.cookies.clear()
+    body = response.json()
+    assert [(item["index"], item["uid"], item["status"]) for item in body["items"]] == [
+        (0, new, "created"),
+        (1, existing, "updated"),
+        (2, conflicting, "failed"),
+        (3, None, "invalid"),
+        (4, revived, "created"),
+    ]
+    assert "red" in body["items"][2]["detail"]
+    assert (body["created"], body["updated"], body["failed"]) == (2, 1, 2)
+
+    assert (await client.get(f"/v1/products/product/{conflicting}")).status_code == 404
+    assert (await client.get(f"/v1/products/product/{revived}")).json()["name"] == "revived again"
+    product = (await client.get(f"/v1/products/product/{new}")).json()
+    assert product["properties"][0]["values"] == [{"value_uid": f"{token}-red", "value": "red"}]
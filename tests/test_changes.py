@@ -0,0 +1,65 @@
+from uuid import uuid4
+
+import pytest
+
+from infrastructure.db.database import AsyncSessionLocal
+from infrastructure.db.repositories import SQLProductRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def revision() -> int:
+    async with AsyncSessionLocal() as session:
+        return await SQLProductRepository(session).get_revision()
+
+
+async def upsert(client, *products: dict):
+    response = await client.post("/v1/products/bulk", json=list(products))
+    assert response.status_code == 200
+    client.cookies.clear()
+
+
+async def changes(client, **params) -> dict:
+    response = await client.get("/v1/products/changes", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_delete_is_a_tombstone_and_readd_revives(client):
+    uid = uuid4().hex
+    created = await revision()
+    await upsert(client, {"uid": uid, "name": "before", "properties": []})
+    feed = await changes(client, since=created)
+    assert [p["uid"] for p in feed["products"]] == [uid]
+    assert feed["deleted"] == []
+
+    deleted = await revision()
+    assert (await client.delete(f"/v1/products/product/{uid}")).status_code == 204
+    for since in (created, deleted):
+        feed = await changes(client, since=since)
+        assert feed["deleted"] == [uid]
+        assert feed["products"] == []
+    # Клиент, синхронизированный после удаления, его больше не видит
+    assert (await changes(client, since=feed["revision"]))["deleted"] == []
+
+    readded = await revision()
+    await upsert(client, {"uid": uid, "name": "after", "properties": []})
+    feed = await changes(client, since=readded)
+    assert [(p["uid"], p["name"]) for p in feed["products"]] == [(uid, "after")]
+    assert feed["deleted"] == []
+    assert (await client.get(f"/v1/products/product/{uid}")).json()["name"] == "after"
+
+
+async def test_cursor_pages_through_one_revision(client):
+    # Товары одной пачки получают один change_seq — страницы делятся по uid без пропусков и повторов
+    token = uuid4().hex
+    since = await revision()
+    await upsert(client, *({"uid": f"{token}-{i}", "name": token, "properties": []} for i in range(5)))
+    seen, params = [], {"since": since, "limit": 2}
+    while True:
+        feed = await changes(client, **params)
+        seen.extend(p["uid"] for p in feed["products"])
+        if feed["next_cursor"] is None:
+            break
+        params = {"cursor": feed["next_cursor"], "limit": 2}
+    assert seen == [f"{token}-{i}" for i in range(5)]
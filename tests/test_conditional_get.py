@@ -0,0 +1,49 @@
+import pytest
+
+from application.services import ProductService
+
+pytestmark = pytest.mark.anyio
+
+ENDPOINTS = [
+    ("/v1/catalog/", {"page_size": 5}, "catalog_list_products"),
+    ("/v1/catalog/filter/", {}, "get_filter_statistics"),
+]
+
+
+async def touch(client):
+    # Любая запись поднимает ревизию каталога
+    response = await client.post("/v1/products/", json={"name": "ETag", "properties": []})
+    assert response.status_code == 200
+    client.cookies.clear()
+
+
+@pytest.mark.parametrize("path, params, method", ENDPOINTS)
+async def test_matching_etag_returns_304_without_loading(client, monkeypatch, path, params, method):
+    first = await client.get(path, params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("304 must not load the response")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ProductService, method, fail)
+        for header in (etag, f'"other", W/{etag}', "*"):
+            response = await client.get(path, params=params, headers={"If-None-Match": header})
+            assert response.status_code == 304, header
+            assert response.headers["etag"] == etag
+            assert response.content == b""
+
+
+@pytest.mark.parametrize("path, params, method", ENDPOINTS)
+async def test_etag_depends_on_query_and_revision(client, path, params, method):
+    etag = (await client.get(path, params=params)).headers["etag"]
+    other_query = await client.get(path, params={**params, "name": "etag"}, headers={"If-None-Match": etag})
+    assert other_query.status_code == 200
+    assert other_query.headers["etag"] != etag
+
+    await touch(client)
+    changed = await client.get(path, params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()
@@ -0,0 +1,35 @@
+import base64
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def cursor(sort: str, key: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"sort": sort, "key": key}).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort, key", [
+    ("uid", [1]),
+    ("uid", [None]),
+    ("uid", [["a"]]),
+    ("name", ["a", {"b": 1}]),
+    ("name", [1, "a"]),
+])
+async def test_catalog_cursor_key_types(client, sort, key):
+    response = await client.get("/v1/catalog/", params={"sort": sort, "cursor": cursor(sort, key)})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("key", [["1", "a"], [True, "a"], [1.5, "a"], [1, 2], [1, None]])
+async def test_changes_cursor_key_types(client, key):
+    response = await client.get("/v1/products/changes", params={"cursor": cursor("changes", key)})
+    assert response.status_code == 400
+
+
+async def test_cursors_round_trip(client):
+    page = (await client.get("/v1/catalog/", params={"sort": "name", "page_size": 1})).json()
+    assert (await client.get("/v1/catalog/", params={"sort": "name", "cursor": page["next_cursor"]})).status_code == 200
+    changes = (await client.get("/v1/products/changes", params={"limit": 1})).json()
+    assert (await client.get("/v1/products/changes", params={"cursor": changes["next_cursor"]})).status_code == 200
@@ -0,0 +1,29 @@
+from uuid import uuid4
+
+import pytest
+
+import api.dependencies
+from config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("mode", ["json", "join"])
+async def test_document_order_is_stable(client, monkeypatch, mode):
+    # Свойства и значения создаются вразнобой, а в ответе идут по uid: иначе тело и ETag зависят от плана запроса
+    monkeypatch.setattr(api.dependencies, "response_cache", None)
+    monkeypatch.setattr(settings, "PRODUCT_FETCH_MODE", mode)
+    token = uuid4().hex
+    properties = [
+        {"uid": f"{token}-p{p}", "name": f"Order {p}", "type": "str",
+         "values": [{"value_uid": f"{token}-p{p}-v{v}", "value": f"value {v}"} for v in (2, 0, 1)]}
+        for p in (1, 2, 0)
+    ]
+    response = await client.post("/v1/products/bulk", json=[{"uid": token, "name": token, "properties": properties}])
+    assert response.status_code == 200
+    client.cookies.clear()
+
+    products = (await client.get("/v1/catalog/", params={"name": token})).json()["products"]
+    assert [p["uid"] for p in products[0]["properties"]] == [f"{token}-p{p}" for p in range(3)]
+    for property in products[0]["properties"]:
+        assert [v["value_uid"] for v in property["values"]] == [f"{property['uid']}-v{v}" for v in range(3)]
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import HTTPException
+
+from api.v1.endpoints.catalog import STREAM_RETRY_MS, stream_body
+from infrastructure.events import EventBroker
+
+pytestmark = pytest.mark.anyio
+
+
+def drain(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait()["id"])
+    return events
+
+
+async def test_resume_replays_events_after_last_event_id():
+    broker = EventBroker(buffer=10, history=10, max_subscribers=10, batch_size=2)
+    await broker.publish(10, [("updated", ["a", "b", "c"])])
+    await broker.publish(11, [("deleted", ["d"])])
+
+    subscription = broker.subscribe("10.0")
+    assert drain(subscription) == ["10.1", "11.0"]
+    # Остальные события ревизии 10 могли не дойти — догонять с ревизии перед ней
+    assert subscription.since == 9 and not subscription.overflowed
+    await broker.publish(12, [("created", ["e"])])
+    assert drain(subscription) == ["12.0"]
+
+
+async def test_resume_past_history_asks_for_resync():
+    broker = EventBroker(buffer=10, history=2, max_subscribers=10, batch_size=1)
+    await broker.publish(5, [("updated", ["a", "b", "c"])])
+    subscription = broker.subscribe("5.0")
+    assert subscription.overflowed and subscription.since == 4
+    assert subscription not in broker.subscribers
+    assert [message async for message in stream_body(subscription)][1:] == [
+        'event: resync\ndata: {"since":4}\n\n',
+    ]
+
+
+async def test_slow_subscriber_is_dropped_with_resync():
+    broker = EventBroker(buffer=2, history=10, max_subscribers=10, batch_size=1)
+    slow = broker.subscribe()
+    await broker.publish(7, [("updated", ["a"])])
+    fast = broker.subscribe()
+    await broker.publish(8, [("updated", ["b", "c"])])
+    assert drain(fast) == ["8.0", "8.1"]
+
+    # Буфер медленного переполнен: он отключён, а успевшие события и resync отдаются до конца
+    assert slow.overflowed and slow not in broker.subscribers and broker.dropped == 1
+    messages = [message async for message in stream_body(slow)]
+    assert [message.split("\n", 1)[0] for message in messages] == [
+        f"retry: {STREAM_RETRY_MS}", "id: 7.0", "id: 8.0", "event: resync",
+    ]
+    assert messages[-1] == 'event: resync\ndata: {"since":7}\n\n'
+    await broker.publish(9, [("updated", ["d"])])
+    assert drain(fast) == ["9.0"] and slow.queue.empty()
+
+
+async def test_subscriber_limit():
+    broker = EventBroker(buffer=1, history=1, max_subscribers=1, batch_size=1)
+    broker.subscribe()
+    with pytest.raises(HTTPException) as error:
+        broker.subscribe()
+    assert error.value.status_code == 503
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from uuid import uuid4
+
+import pytest
+
+import api.v1.endpoints.products as products_endpoint
+from config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def token(client):
+    token = uuid4().hex
+    colour = {"uid": f"{token}-colour", "name": "Colour, \"quoted\"", "type": "str", "values": [
+        {"value_uid": f"{token}-v1", "value": "red"}, {"value_uid": f"{token}-v2", "value": "line\nbreak"},
+    ]}
+    response = await client.post("/v1/products/bulk", json=[
+        {"uid": f"{token}-0", "name": 'Say "hi", ok', "properties": [colour]},
+        {"uid": f"{token}-1", "name": "deleted", "properties": []},
+        {"uid": f"{token}-2", "name": "bare", "properties": []},
+    ])
+    assert response.status_code == 200
+    assert (await client.delete(f"/v1/products/product/{token}-1")).status_code == 204
+    client.cookies.clear()
+    return token
+
+
+async def export(client, monkeypatch, format: str) -> str:
+    # Маленькие пачки и чанки: товары идут через границы выборок и частей ответа
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 50)
+    monkeypatch.setattr(products_endpoint, "EXPORT_CHUNK_SIZE", 1000)
+    response = await client.get("/v1/products/export", params={"format": format})
+    assert response.status_code == 200
+    return response.text
+
+
+async def live_count(client) -> int:
+    return (await client.get("/v1/catalog/", params={"page_size": 1, "with_count": True})).json()["count"]
+
+
+async def test_ndjson_streams_every_live_product(client, monkeypatch, token):
+    products = [json.loads(line) for line in (await export(client, monkeypatch, "ndjson")).splitlines()]
+    uids = [product["uid"] for product in products]
+    assert len(uids) == len(set(uids)) == await live_count(client)
+    ours = [product for product in products if product["uid"].startswith(token)]
+    assert [product["uid"] for product in ours] == [f"{token}-0", f"{token}-2"]
+    assert ours[0]["name"] == 'Say "hi", ok'
+    assert [v["value"] for v in ours[0]["properties"][0]["values"]] == ["red", "line\nbreak"]
+    assert ours[1]["properties"] == []
+
+
+async def test_csv_escapes_fields_and_keeps_one_row_per_value(client, monkeypatch, token):
+    rows = list(csv.reader(io.StringIO(await export(client, monkeypatch, "csv"), newline="")))
+    assert tuple(rows[0]) == products_endpoint.EXPORT_CSV_COLUMNS
+    assert len({row[0] for row in rows[1:]}) == await live_count(client)
+    assert [row for row in rows if row[0].startswith(token)] == [
+        [f"{token}-0", 'Say "hi", ok', f"{token}-colour", 'Colour, "quoted"', "str", f"{token}-v1", "red"],
+        [f"{token}-0", 'Say "hi", ok', f"{token}-colour", 'Colour, "quoted"', "str", f"{token}-v2", "line\nbreak"],
+        [f"{token}-2", "bare", "", "", "", "", ""],
+    ]
@@ -0,0 +1,46 @@
+import pytest
+
+from infrastructure.db.database import AsyncSessionLocal
+from infrastructure.db.facet_index import facet_index
+from infrastructure.db.repositories import SQLProductRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def create(client):
+    product = {"name": "Facet", "properties": [{"name": "Facet", "type": "str", "values": [{"value": "on"}]}]}
+    assert (await client.post("/v1/products/", json=product)).status_code == 200
+    client.cookies.clear()
+
+
+async def revision() -> int:
+    async with AsyncSessionLocal() as session:
+        return await SQLProductRepository(session).get_revision()
+
+
+async def total(client) -> int:
+    response = await client.get("/v1/catalog/filter/")
+    assert response.status_code == 200
+    return response.json()["count"]
+
+
+async def test_local_write_advances_index(client):
+    await facet_index.rebuild()
+    before = await total(client)
+    await create(client)
+    assert facet_index.ensure_loaded(await revision())
+    assert await total(client) == before + 1
+
+
+async def test_write_from_another_worker_bypasses_stale_index(client, monkeypatch):
+    await facet_index.rebuild()
+    before = await total(client)
+    # Запись другого воркера: индекс этого процесса о ней не узнаёт, но ETag и ключ кэша уже новые
+    with monkeypatch.context() as patch:
+        patch.setattr(facet_index, "_apply", lambda *args: None)
+        await create(client)
+    assert not facet_index.ensure_loaded(await revision())
+    assert await total(client) == before + 1
+    await facet_index.rebuild()
+    assert facet_index.ensure_loaded(await revision())
+    assert await total(client) == before + 1
@@ -0,0 +1,53 @@
+from uuid import uuid4
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("bound", ["NaN", "-Infinity", "sNaN", "abc"])
+async def test_non_finite_range_bound_rejected(client, bound):
+    for path in ("/v1/catalog/", "/v1/catalog/filter/"):
+        response = await client.get(path, params={"filters": f"weight:gt:{bound}"})
+        assert response.status_code == 400, (path, bound)
+
+
+async def test_finite_range_bound_accepted(client):
+    response = await client.get("/v1/catalog/", params={"filters": "weight:gte:1.5e2"})
+    assert response.status_code == 200
+
+
+@pytest.fixture(scope="module")
+async def grid(client):
+    token = uuid4().hex
+    colors, sizes = ("red", "green", "blue"), ("s", "m", "l")
+
+    def prop(name: str, value: str) -> dict:
+        return {"uid": f"{token}-{name}", "name": name, "type": "str",
+                "values": [{"value_uid": f"{token}-{name}-{value}", "value": value}]}
+
+    products = [
+        {"uid": f"{token}-{color}-{size}", "name": token, "properties": [prop("color", color), prop("size", size)]}
+        for color in colors for size in sizes
+    ]
+    # У товара без размера фильтр по размеру не должен совпасть ни с чем
+    products.append({"uid": f"{token}-red-none", "name": token, "properties": [prop("color", "red")]})
+    response = await client.post("/v1/products/bulk", json=products)
+    assert response.status_code == 200
+    client.cookies.clear()
+    return token
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"color": ["red", "blue"]}, ["blue-l", "blue-m", "blue-s", "red-l", "red-m", "red-none", "red-s"]),
+    ({"color": ["red", "blue"], "size": ["m", "l"]}, ["blue-l", "blue-m", "red-l", "red-m"]),
+    ({"color": ["green"], "size": ["s"]}, ["green-s"]),
+    ({"color": ["green"], "size": ["missing"]}, []),
+])
+async def test_values_or_properties_and(client, grid, filters, expected):
+    # Значения одного свойства объединяются через OR, разные свойства — через AND
+    params = {"filters": [f"{grid}-{name}:{value}" for name, values in filters.items() for value in values]}
+    products = (await client.get("/v1/catalog/", params={**params, "page_size": 100})).json()["products"]
+    assert sorted(p["uid"] for p in products) == [f"{grid}-{uid}" for uid in expected]
+    statistics = (await client.get("/v1/catalog/filter/", params=params)).json()
+    assert statistics["count"] == len(expected)
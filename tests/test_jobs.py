@@ -0,0 +1,55 @@
+from uuid import uuid4
+
+import pytest
+
+from api.jobs import bulk_import
+from application.services import JobService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    # Задача не запускается: проверяем payload, с которым она встала бы в очередь
+    jobs = []
+
+    async def submit(self, kind, payload=None):
+        jobs.append((kind, payload))
+        return {"id": str(uuid4()), "kind": kind, "status": "queued", "progress": 0}
+
+    monkeypatch.setattr(JobService, "submit", submit)
+    return jobs
+
+
+async def noop_progress(done, total):
+    pass
+
+
+async def test_generic_bulk_import_is_validated_and_idempotent(client, submitted):
+    token = uuid4().hex
+    products = [
+        {"name": f"{token} a", "properties": [{"name": "Color", "type": "str", "values": [{"value": "red"}]}]},
+        {"properties": []},
+        {"name": f"{token} b", "properties": None},
+    ]
+    response = await client.post("/v1/jobs/bulk_import", json={"products": products})
+    assert response.status_code == 202
+    [(kind, payload)] = submitted
+    assert kind == "bulk_import"
+    assert payload["indexes"] == [0, 2]
+    assert [item["index"] for item in payload["invalid"]] == [1]
+    assert all(product["uid"] for product in payload["products"])
+    assert payload["products"][0]["properties"][0]["uid"]
+
+    # Повтор отпущенной или просроченной задачи обновляет те же товары
+    for _ in range(2):
+        await bulk_import(payload, noop_progress)
+    listed = (await client.get("/v1/catalog/", params={"name": token, "page_size": 10})).json()
+    by_name = {p["name"]: p for p in listed["products"]}
+    assert sorted(by_name) == [f"{token} a", f"{token} b"]
+    assert len(by_name[f"{token} a"]["properties"]) == 1
+
+
+async def test_generic_bulk_import_requires_products(client, submitted):
+    assert (await client.post("/v1/jobs/bulk_import", json={"items": []})).status_code == 422
+    assert not submitted
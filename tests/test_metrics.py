@@ -0,0 +1,24 @@
+import pytest
+
+from config import settings
+from infrastructure.metrics import MetricsMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("metrics_enabled", [True, False])
+async def test_middleware_propagates_app_errors(monkeypatch, metrics_enabled):
+    monkeypatch.setattr(settings, "QUERY_DEBUG", True)
+    monkeypatch.setattr(settings, "METRICS_ENABLED", metrics_enabled)
+
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    with pytest.raises(RuntimeError, match="boom"):
+        await MetricsMiddleware(app)({"type": "http", "method": "GET", "path": "/"}, receive, send)
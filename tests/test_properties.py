@@ -0,0 +1,33 @@
+from uuid import uuid4
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_recreate_deleted_property(client):
+    uid = str(uuid4())
+    value_uid = str(uuid4())
+    created = await client.post("/v1/properties/", json={
+        "uid": uid, "name": "Color", "type": "str", "values": [{"value_uid": value_uid, "value": "red"}],
+    })
+    assert created.status_code == 200
+    assert (await client.delete(f"/v1/properties/{uid}")).status_code == 204
+
+    recreated = await client.post("/v1/properties/", json={
+        "uid": uid, "name": "Colour", "type": "str",
+        "values": [{"value_uid": value_uid, "value": "blue"}, {"value_uid": None, "value": "green"}],
+    })
+    assert recreated.status_code == 200
+    assert recreated.json()["name"] == "Colour"
+    assert sorted(v["value"] for v in recreated.json()["values"]) == ["blue", "green"]
+
+    listed = {p["uid"]: p for p in (await client.get("/v1/properties/")).json()}
+    assert sorted(v["value"] for v in listed[uid]["values"]) == ["blue", "green"]
+
+
+async def test_create_existing_property_conflicts(client):
+    uid = str(uuid4())
+    payload = {"uid": uid, "name": "Size", "type": "str", "values": []}
+    assert (await client.post("/v1/properties/", json=payload)).status_code == 200
+    assert (await client.post("/v1/properties/", json=payload)).status_code == 409
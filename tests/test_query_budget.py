@@ -0,0 +1,79 @@
+from uuid import uuid4
+
+import pytest
+
+import api.dependencies
+from config import settings
+from infrastructure.db.facet_index import facet_index
+from infrastructure.db.query_budget import expect_queries, record_queries
+
+pytestmark = pytest.mark.anyio
+
+# Число запросов не должно зависеть от размера страницы и числа свойств товара: рост — это N+1
+CATALOG_BUDGET = 4
+FILTER_BUDGET = 5
+PRODUCT_BUDGET = 3
+
+
+@pytest.fixture
+def no_cache(monkeypatch):
+    # Кэш ответов спрятал бы запросы повторного чтения
+    monkeypatch.setattr(api.dependencies, "response_cache", None)
+
+
+@pytest.fixture(scope="module")
+async def catalog(client):
+    token = uuid4().hex
+    properties = [
+        {"uid": f"{token}-p{p}", "name": f"Budget {p}", "type": "str",
+         "values": [{"value_uid": f"{token}-p{p}-v{v}", "value": f"value {v}"} for v in range(2)]}
+        for p in range(5)
+    ]
+    products = [
+        {"uid": f"{token}-{i:02d}", "name": f"{token} {i}", "properties": properties[:1 + i % 5]}
+        for i in range(30)
+    ]
+    response = await client.post("/v1/products/bulk", json=products)
+    assert response.status_code == 200
+    client.cookies.clear()
+    return {"token": token, "property": properties[0]["uid"], "products": products}
+
+
+async def query_count(client, url: str, **params) -> int:
+    with record_queries() as log:
+        response = await client.get(url, params=params)
+    assert response.status_code == 200, response.text
+    # Ноль значит, что запросы не записываются, и бюджеты ниже ничего не проверяют
+    assert log.count > 0
+    return log.count
+
+
+async def test_catalog_page_queries(client, catalog, no_cache):
+    small = await query_count(client, "/v1/catalog/", name=catalog["token"], page_size=1)
+    with expect_queries(CATALOG_BUDGET):
+        response = await client.get("/v1/catalog/", params={"name": catalog["token"], "page_size": 30})
+    assert len(response.json()["products"]) == 30
+    assert await query_count(client, "/v1/catalog/", name=catalog["token"], page_size=30) == small
+
+
+async def test_filter_statistics_queries(client, catalog, no_cache, monkeypatch):
+    monkeypatch.setattr(settings, "FACET_INDEX_ENABLED", False)
+    with expect_queries(FILTER_BUDGET):
+        await client.get("/v1/catalog/filter/")
+    with expect_queries(FILTER_BUDGET):
+        await client.get("/v1/catalog/filter/", params={"filters": f"{catalog['property']}:value 0"})
+
+    monkeypatch.setattr(settings, "FACET_INDEX_ENABLED", True)
+    await facet_index.rebuild()
+    # Из индекса — только ревизия для ETag
+    with expect_queries(1):
+        await client.get("/v1/catalog/filter/")
+
+
+async def test_product_queries(client, catalog, no_cache):
+    few, many = catalog["products"][0], catalog["products"][4]
+    assert len(many["properties"]) > len(few["properties"])
+    with expect_queries(PRODUCT_BUDGET):
+        await client.get(f"/v1/products/product/{many['uid']}")
+    assert (await query_count(client, f"/v1/products/product/{few['uid']}")
+            == await query_count(client, f"/v1/products/product/{many['uid']}"))
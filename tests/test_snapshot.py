@@ -0,0 +1,131 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from config import settings
+from infrastructure.db.database import AsyncSessionLocal
+from infrastructure.db.repositories import SQLProductRepository, SnapshotProductRepository
+import infrastructure.db.snapshot as snapshot_module
+from infrastructure.db.snapshot import SnapshotEngine, load_snapshot
+
+pytestmark = pytest.mark.anyio
+
+
+def product(token: str, index: int, name_suffix: str = "") -> dict:
+    properties = [
+        {"uid": f"{token}-common", "name": "Common", "type": "str",
+         "values": [{"value_uid": f"{token}-common-v", "value": "yes"}]},
+        {"uid": f"{token}-color", "name": "Color", "type": "str",
+         "values": [{"value_uid": f"{token}-color-{index % 3}", "value": ("red", "green", "blue")[index % 3]}]},
+        {"uid": f"{token}-size", "name": "Size", "type": "int",
+         "values": [{"value_uid": f"{token}-size-{index % 5}", "value": str(index % 5)}]},
+    ]
+    if index % 50 == 0:
+        properties.append({"uid": f"{token}-rare", "name": "Rare", "type": "str",
+                           "values": [{"value_uid": f"{token}-rare-v", "value": "rare"}]})
+    # Повторяющиеся имена проверяют порядок (name, uid); товар без свойств — пустой документ
+    return {"uid": f"{token}-{index:03d}", "name": f"{token} {index % 7}{name_suffix}",
+            "properties": properties if index % 37 else []}
+
+
+@pytest.fixture(scope="module")
+async def token(client):
+    token = uuid4().hex
+    response = await client.post("/v1/products/bulk", json=[product(token, i) for i in range(300)])
+    assert response.status_code == 200
+    client.cookies.clear()
+    return token
+
+
+@pytest.fixture(params=[1, 32, 10 ** 9], ids=["sparse", "mixed", "dense"])
+async def repositories(token, monkeypatch, request):
+    # SQL считает статистику сам, без индекса фильтров; порог задаёт, какие значения хранятся слотами, а какие масками
+    monkeypatch.setattr(settings, "FACET_INDEX_ENABLED", False)
+    monkeypatch.setattr(snapshot_module, "SPARSE_FACTOR", request.param)
+    engine = SnapshotEngine(AsyncSessionLocal, settings.SNAPSHOT_POLL_INTERVAL)
+    async with AsyncSessionLocal() as session:
+        engine.snapshot = await load_snapshot(session)
+    async with AsyncSessionLocal() as session:
+        sql = SQLProductRepository(session)
+        yield engine, sql, SnapshotProductRepository(sql, engine)
+
+
+def cases(token: str) -> list:
+    return [
+        ({f"{token}-common": ["yes"]}, None),
+        ({f"{token}-color": ["red", "blue"]}, None),
+        ({f"{token}-color": ["green"], f"{token}-size": ["1", "3"]}, None),
+        ({f"{token}-rare": ["rare"]}, None),
+        ({f"{token}-color": ["red"], f"{token}-rare": ["rare"]}, None),
+        ({f"{token}-color": ["missing"]}, None),
+        ({f"{token}-common": ["yes"]}, {f"{token}-size": {"gte": Decimal(2), "lt": Decimal(4)}}),
+        (None, {f"{token}-size": {"gt": Decimal(3)}}),
+    ]
+
+
+async def assert_parity(token: str, sql, snapshot) -> None:
+    for filters, ranges in cases(token):
+        for sort in ("uid", "name"):
+            for page in (1, 3):
+                args = (page, 7, filters, None, sort, None, True, ranges, "contains", True)
+                expected = await sql.get_filtered_products(*args)
+                assert await snapshot.get_filtered_products(*args) == expected, (filters, ranges, sort, page)
+            # Страницы по курсору: следующая начинается с ключа последнего товара предыдущей
+            after = None
+            while True:
+                args = (1, 40, filters, None, sort, after, False, ranges, "contains", True)
+                expected = await sql.get_filtered_products(*args)
+                assert await snapshot.get_filtered_products(*args) == expected, (filters, ranges, sort, after)
+                after = expected["next_key"]
+                if after is None:
+                    break
+        assert await snapshot.get_filter_statistics(filters, None, ranges) == \
+            await sql.get_filter_statistics(filters, None, ranges)
+    assert await snapshot.get_filter_statistics() == await sql.get_filter_statistics()
+
+
+async def test_snapshot_matches_sql(token, repositories):
+    _, sql, snapshot = repositories
+    await assert_parity(token, sql, snapshot)
+
+
+async def test_snapshot_catches_up_on_truncated_changes(client, token, repositories):
+    engine, sql, snapshot = repositories
+    loaded, revision = engine.snapshot, engine.snapshot.revision
+    # Пачка из сотен uid не влезает в уведомление и приходит как {"products": null}
+    changed = [product(token, i, " renamed") for i in range(0, 300, 2)]
+    assert (await client.post("/v1/products/bulk", json=changed)).status_code == 200
+    assert (await client.delete(f"/v1/products/product/{token}-001")).status_code == 204
+    client.cookies.clear()
+    await engine._apply([(revision + 1, {"products": None, "properties": []}), (revision + 2, {"products": None})])
+    assert engine.snapshot is loaded and engine.snapshot.revision == revision + 2
+    assert engine.snapshot.slot_of(f"{token}-001") is None
+    await assert_parity(token, sql, snapshot)
+
+
+async def test_name_order_is_bytewise_in_both_engines(client):
+    # Регистр, пунктуация и не-ASCII: в лингвистическом collation порядок этих имён другой
+    token = uuid4().hex
+    suffixes = ["b", "B", "a", "A", "_z", "a b", "a-c", "ab", "Ä", "é", "e", "Z"]
+    products = [{"uid": f"{token}-{i:02d}", "name": f"{token} {suffix}", "properties": []}
+                for i, suffix in enumerate(suffixes)]
+    assert (await client.post("/v1/products/bulk", json=products)).status_code == 200
+    client.cookies.clear()
+    expected = [p["uid"] for p in sorted(products, key=lambda p: (p["name"], p["uid"]))]
+
+    engine = SnapshotEngine(AsyncSessionLocal, settings.SNAPSHOT_POLL_INTERVAL)
+    async with AsyncSessionLocal() as session:
+        engine.snapshot = await load_snapshot(session)
+    async with AsyncSessionLocal() as session:
+        sql = SQLProductRepository(session)
+        for repository in (sql, SnapshotProductRepository(sql, engine)):
+            seen, after = [], None
+            while True:
+                page = await repository.get_filtered_products(1, 5, None, token, "name", after, False, None,
+                                                              "contains", True)
+                seen += [document["uid"] for document in page["products"]]
+                after = page["next_key"]
+                if after is None:
+                    break
+            assert seen == expected, repository